@@ -1 +1 @@
-from .game import ChessGame
+from .game import ChessGame, Termination
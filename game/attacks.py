@@ -0,0 +1,144 @@
+from .pieces import Color, Pawn, KING_OFFSETS, KNIGHT_OFFSETS, on_board
+
+# Offsets of the pieces that attack by jumping to a single square
+JUMP_OFFSETS = KNIGHT_OFFSETS + KING_OFFSETS
+
+
+def is_attacked(board, position, color):
+    """Check if a position is attacked by the opponents of 'color'
+
+    Instead of trying to move every enemy piece to the position, the
+    search starts at the position and looks outward for pieces that
+    could reach it: jumps for knights and kings, diagonals for pawns and
+    rays for the sliding pieces.
+
+    Arguments:
+        board (ChessGame): Game to inspect
+        position (tuple[int, int]): Position to check for attacks
+        color (Color): allied color
+    """
+    row, col = position
+
+    for row_step, col_step in JUMP_OFFSETS:
+        square = (row + row_step, col + col_step)
+        if not on_board(square):
+            continue
+
+        piece = board[square]
+        if (
+            piece is not None
+            and piece.color != color
+            and not piece.sliding
+            and (row_step, col_step) in piece.directions
+        ):
+            return True
+
+    # Enemy pawns attack from the row in front of the allied pawns
+    pawn_row = row + color.value
+    for pawn_col in (col - 1, col + 1):
+        if not on_board((pawn_row, pawn_col)):
+            continue
+
+        piece = board[pawn_row, pawn_col]
+        if isinstance(piece, Pawn) and piece.color != color:
+            return True
+
+    for direction, attacker_position in _first_pieces(board, position):
+        piece = board[attacker_position]
+        if piece.color != color and piece.sliding and direction in piece.directions:
+            return True
+
+    return False
+
+
+def _first_pieces(board, position):
+    """Yield the first piece found along each ray leaving 'position'
+
+    Yields pairs of (direction, position of the piece found).
+    """
+    row, col = position
+    for row_step, col_step in KING_OFFSETS:
+        square = (row + row_step, col + col_step)
+        while on_board(square):
+            if board[square] is not None:
+                yield (row_step, col_step), square
+                break
+            square = (square[0] + row_step, square[1] + col_step)
+
+
+class AttackMap:
+    """Per-color count of the attackers of each square
+
+    The map is updated incrementally: when a square changes, only the
+    piece on it and the sliding pieces whose rays reach it have their
+    attacks recomputed.
+
+    This is an analysis and debugging aid, not a faster check detection.
+    The rays are walked again on every change of the board, which costs
+    more than the few 'is_attacked' queries of a move, so perft runs
+    about 4x slower with the map. The engine and perft do not use it.
+
+    Attributes:
+        board (ChessGame): Game being tracked
+        counts (dict[Color, list[int]]): Number of attackers of each
+            square, indexed by 'row * 8 + col'
+        attacks (dict[tuple[int, int], tuple]): Color and attacked
+            squares of the piece on each occupied position
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute the whole map from the board state"""
+        self.counts = {Color.WHITE: [0] * 64, Color.BLACK: [0] * 64}
+        self.attacks = {}
+
+        for position, piece in self.board:
+            if piece is not None:
+                self._refresh(position)
+
+    def update(self, position):
+        """Update the map after the content of 'position' changed
+
+        Arguments:
+            position (tuple[int, int]): Changed position
+        """
+        self._refresh(position)
+
+        for direction, origin in _first_pieces(self.board, position):
+            piece = self.board[origin]
+            if piece.sliding and direction in piece.directions:
+                self._refresh(origin)
+
+    def is_attacked(self, position, color):
+        """Check if a position is attacked by the opponents of 'color'
+
+        Arguments:
+            position (tuple[int, int]): Position to check for attacks
+            color (Color): allied color
+        """
+        enemy = Color.BLACK if color == Color.WHITE else Color.WHITE
+        return self.counts[enemy][position[0] * 8 + position[1]] > 0
+
+    def _refresh(self, origin):
+        """Recompute the attacks of the piece on 'origin'"""
+        try:
+            color, squares = self.attacks.pop(origin)
+        except KeyError:
+            pass
+        else:
+            counts = self.counts[color]
+            for row, col in squares:
+                counts[row * 8 + col] -= 1
+
+        piece = self.board[origin]
+        if piece is None:
+            return
+
+        squares = tuple(piece.attacks(origin, self.board))
+        counts = self.counts[piece.color]
+        for row, col in squares:
+            counts[row * 8 + col] += 1
+        self.attacks[origin] = (piece.color, squares)
@@ -0,0 +1,147 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+
+from .game import ChessGame
+from .pgn import PgnError, replay, game_result
+
+
+@dataclass
+class GameVerdict:
+    """Outcome of the validation of one game
+
+    Attributes:
+        index (int): Position of the game in the input, starting at 0
+        legal (bool): Whether all the movements are legal
+        plies (int): Number of movements played
+        result (str): Result reached on the board ("1-0", "0-1",
+            "1/2-1/2" or "*")
+        error_ply (int | None): Index of the first illegal movement
+        error (str | None): Description of the error
+    """
+
+    index: int
+    legal: bool
+    plies: int
+    result: str
+    error_ply: int | None = None
+    error: str | None = None
+
+
+@dataclass
+class BatchStats:
+    """Throughput statistics of a batch run"""
+
+    games: int = 0
+    illegal: int = 0
+    plies: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def games_per_second(self):
+        return self.games / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def plies_per_second(self):
+        return self.plies / self.elapsed if self.elapsed else 0.0
+
+
+# Game reused by all the chunks validated in a worker process
+_worker_game = None
+
+
+def _init_worker():
+    global _worker_game
+    # Recorded games often continue after a draw could be claimed
+    _worker_game = ChessGame(claim_draws=False)
+
+
+def _validate_chunk(first_index, pgn_games):
+    """Validate a chunk of games with the game of the worker process"""
+    if _worker_game is None:
+        _init_worker()
+
+    verdicts = []
+    for index, pgn_game in enumerate(pgn_games, first_index):
+        try:
+            replay(pgn_game, _worker_game)
+        except PgnError as error:
+            verdicts.append(
+                GameVerdict(
+                    index,
+                    False,
+                    len(_worker_game.history),
+                    game_result(_worker_game),
+                    error.ply,
+                    str(error),
+                )
+            )
+        else:
+            verdicts.append(
+                GameVerdict(
+                    index, True, len(_worker_game.history), game_result(_worker_game)
+                )
+            )
+    return verdicts
+
+
+def validate_games(games, workers=None, chunk_size=64, max_pending=None, stats=None):
+    """Validate a stream of games across worker processes
+
+    The games are sent to the workers in chunks, and at most
+    'max_pending' chunks are in flight, so the input is only consumed as
+    fast as the workers validate it. The verdicts are yielded in the
+    order of the input.
+
+    Arguments:
+        games (Iterable[PgnGame]): Games to validate
+        workers (Optional[int]): Number of worker processes. Defaults to
+            the number of CPUs. With 1 worker the games are validated in
+            the current process
+        chunk_size (int): Games sent to a worker at a time
+        max_pending (Optional[int]): Maximum number of chunks in flight.
+            Defaults to twice the number of workers
+        stats (Optional[BatchStats]): Updated as the verdicts are
+            yielded
+
+    Yield:
+        A GameVerdict for each game
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    stats = stats if stats is not None else BatchStats()
+    start = time.perf_counter()
+
+    games = iter(games)
+    chunks = (
+        (index * chunk_size, chunk)
+        for index, chunk in enumerate(iter(lambda: list(islice(games, chunk_size)), []))
+    )
+
+    def record(verdicts):
+        for verdict in verdicts:
+            stats.games += 1
+            stats.plies += verdict.plies
+            stats.illegal += not verdict.legal
+            stats.elapsed = time.perf_counter() - start
+            yield verdict
+
+    if workers == 1:
+        for first_index, chunk in chunks:
+            yield from record(_validate_chunk(first_index, chunk))
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as executor:
+        pending = deque()
+        for first_index, chunk in chunks:
+            pending.append(executor.submit(_validate_chunk, first_index, chunk))
+
+            # Backpressure: wait for the oldest chunk before reading more
+            if len(pending) >= max_pending:
+                yield from record(pending.popleft().result())
+
+        while pending:
+            yield from record(pending.popleft().result())
@@ -0,0 +1,234 @@
+from .pieces import (
+    Color,
+    King,
+    Knight,
+    Rook,
+    Queen,
+    Bishop,
+    Pawn,
+    STRAIGHT_DIRECTIONS,
+    DIAGONAL_DIRECTIONS,
+    KING_OFFSETS,
+    KNIGHT_OFFSETS,
+    PIECE_TYPES,
+    on_board,
+)
+
+# Squares are numbered 'row * 8 + col', so bit 0 is the top left corner
+# of the board (row 0, column 0) and bit 63 the bottom right one
+PIECE_INDEX = {piece_class: piece_class.kind for piece_class in PIECE_TYPES}
+COLOR_INDEX = {Color.WHITE: 0, Color.BLACK: 1}
+
+
+def square_index(position):
+    """Return the bit index of a (row, col) position"""
+    return position[0] * 8 + position[1]
+
+
+def square_position(index):
+    """Return the (row, col) position of a bit index"""
+    return divmod(index, 8)
+
+
+def bitboard_index(piece_class, color):
+    """Return the index of the bitboard holding the given pieces"""
+    return PIECE_INDEX[piece_class] * 2 + COLOR_INDEX[color]
+
+
+def iter_squares(bitboard):
+    """Yield the indexes of the bits set in the bitboard"""
+    while bitboard:
+        lowest = bitboard & -bitboard
+        yield lowest.bit_length() - 1
+        bitboard ^= lowest
+
+
+def _jump_table(offsets):
+    table = []
+    for index in range(64):
+        row, col = square_position(index)
+        mask = 0
+        for row_step, col_step in offsets:
+            target = (row + row_step, col + col_step)
+            if on_board(target):
+                mask |= 1 << square_index(target)
+        table.append(mask)
+    return tuple(table)
+
+
+def _ray_table(direction):
+    row_step, col_step = direction
+    table = []
+    for index in range(64):
+        row, col = square_position(index)
+        mask = 0
+        target = (row + row_step, col + col_step)
+        while on_board(target):
+            mask |= 1 << square_index(target)
+            target = (target[0] + row_step, target[1] + col_step)
+        table.append(mask)
+    return tuple(table)
+
+
+KNIGHT_ATTACKS = _jump_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _jump_table(KING_OFFSETS)
+# Squares attacked by a pawn of the given color standing on each square
+PAWN_ATTACKS = {
+    color: _jump_table(((color.value, -1), (color.value, 1))) for color in Color
+}
+RAYS = {direction: _ray_table(direction) for direction in KING_OFFSETS}
+
+# Rays of the sliding pieces, flagged by whether the squares along them
+# have increasing indexes (so the nearest blocker is the lowest bit)
+STRAIGHT_RAYS = tuple(
+    (RAYS[direction], direction[0] * 8 + direction[1] > 0)
+    for direction in STRAIGHT_DIRECTIONS
+)
+DIAGONAL_RAYS = tuple(
+    (RAYS[direction], direction[0] * 8 + direction[1] > 0)
+    for direction in DIAGONAL_DIRECTIONS
+)
+
+
+def _sliding_attacks(index, occupied, rays):
+    attacks = 0
+    for ray_table, increasing in rays:
+        ray = ray_table[index]
+        blockers = ray & occupied
+        if blockers:
+            if increasing:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            # Squares behind the nearest blocker are not reachable
+            ray ^= ray_table[blocker]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(index, occupied):
+    """Return the squares attacked by a rook, given the occupied squares"""
+    return _sliding_attacks(index, occupied, STRAIGHT_RAYS)
+
+
+def bishop_attacks(index, occupied):
+    """Return the squares attacked by a bishop, given the occupied squares"""
+    return _sliding_attacks(index, occupied, DIAGONAL_RAYS)
+
+
+def queen_attacks(index, occupied):
+    """Return the squares attacked by a queen, given the occupied squares"""
+    return rook_attacks(index, occupied) | bishop_attacks(index, occupied)
+
+
+class BitboardState:
+    """Board storage based on bitboards
+
+    It can be used as the 'state' of a ChessGame in place of the default
+    dict, as it supports the same (row, col) item access. Besides the
+    Piece instances, it keeps one 64-bit integer per piece type and
+    color, and the occupancy masks, so search and analysis code can work
+    on the bitboards directly.
+
+    Attributes:
+        bitboards (list[int]): One bitboard for each piece type and
+            color, indexed by 'bitboard_index'
+        occupancy (dict[Color, int]): Squares occupied by each color
+        occupied (int): Squares occupied by any piece
+    """
+
+    def __init__(self):
+        self.squares = [None] * 64
+        self.bitboards = [0] * (len(PIECE_TYPES) * 2)
+        self.occupancy = {Color.WHITE: 0, Color.BLACK: 0}
+        self.occupied = 0
+
+    def get(self, position, default=None):
+        row, col = position
+        if not (0 <= row < 8 and 0 <= col < 8):
+            return default
+
+        piece = self.squares[row * 8 + col]
+        return default if piece is None else piece
+
+    def __getitem__(self, position):
+        return self.get(position)
+
+    def __setitem__(self, position, piece):
+        index = square_index(position)
+        bit = 1 << index
+
+        old_piece = self.squares[index]
+        if old_piece is not None:
+            self.bitboards[old_piece.code] ^= bit
+            self.occupancy[old_piece.color] ^= bit
+            self.occupied ^= bit
+
+        self.squares[index] = piece
+        if piece is not None:
+            self.bitboards[piece.code] |= bit
+            self.occupancy[piece.color] |= bit
+            self.occupied |= bit
+
+    def items(self):
+        """Yield the (position, piece) pairs of the occupied squares"""
+        for index in iter_squares(self.occupied):
+            yield square_position(index), self.squares[index]
+
+    def pieces(self, piece_class, color):
+        """Return the bitboard of the given pieces
+
+        Arguments:
+            piece_class (type): Piece type (e.g. Knight)
+            color (Color): Color of the pieces
+        """
+        return self.bitboards[bitboard_index(piece_class, color)]
+
+    def attackers(self, index, color):
+        """Return the bitboard of the pieces of 'color' attacking a square
+
+        Arguments:
+            index (int): Bit index of the attacked square
+            color (Color): Color of the attacking pieces
+        """
+        enemy = Color.BLACK if color == Color.WHITE else Color.WHITE
+        queens = self.pieces(Queen, color)
+
+        return (
+            (KNIGHT_ATTACKS[index] & self.pieces(Knight, color))
+            | (KING_ATTACKS[index] & self.pieces(King, color))
+            # A pawn attacks the square if an enemy pawn standing on it
+            # would attack the pawn back
+            | (PAWN_ATTACKS[enemy][index] & self.pieces(Pawn, color))
+            | (rook_attacks(index, self.occupied) & (self.pieces(Rook, color) | queens))
+            | (
+                bishop_attacks(index, self.occupied)
+                & (self.pieces(Bishop, color) | queens)
+            )
+        )
+
+    def is_attacked(self, position, color):
+        """Check if a position is attacked by the opponents of 'color'
+
+        Arguments:
+            position (tuple[int, int]): Position to check for attacks
+            color (Color): allied color
+        """
+        enemy = Color.BLACK if color == Color.WHITE else Color.WHITE
+        index = square_index(position)
+
+        # Cheapest tests first, the sliding attacks are only computed
+        # when there are enemy sliders left
+        if KNIGHT_ATTACKS[index] & self.pieces(Knight, enemy):
+            return True
+        if PAWN_ATTACKS[color][index] & self.pieces(Pawn, enemy):
+            return True
+        if KING_ATTACKS[index] & self.pieces(King, enemy):
+            return True
+
+        queens = self.pieces(Queen, enemy)
+        straight = self.pieces(Rook, enemy) | queens
+        if straight and rook_attacks(index, self.occupied) & straight:
+            return True
+        diagonal = self.pieces(Bishop, enemy) | queens
+        return bool(diagonal and bishop_attacks(index, self.occupied) & diagonal)
@@ -0,0 +1,307 @@
+"""Opening books in the Polyglot file format
+
+A book is a file of 16 bytes big-endian entries (position key, movement,
+weight and learn data), sorted by position key. Books are read through a
+memory map and binary searched, so lookups do not load the file and
+processes using the same book share it through the page cache.
+
+The position keys are the standard Polyglot keys of 'polyglot_key', so
+books made by other programs can be read, and the ones written by
+'build_book' can be used by other programs. Run as
+'python3 -m game.book build BOOK PGN ...' to build a book, or as
+'python3 -m game.book probe BOOK [FEN]' to list the book movements of a
+position.
+"""
+
+import mmap
+import os
+import random
+import struct
+import sys
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+
+from .fen import STARTING_FEN
+from .game import ChessGame
+from .moves import Castling, Promotion
+from .pgn import PgnError, open_games, parse_san
+from .pieces import King, Knight, Bishop, Rook, Queen
+from .polyglot import polyglot_key
+
+ENTRY = struct.Struct(">QHHI")
+KEY = struct.Struct(">Q")
+# Entries per block of the in-memory index of keys
+BLOCK_ENTRIES = 16
+# Keys of a block of entries, skipping the rest of each entry
+BLOCK_KEYS = struct.Struct(">" + "Q8x" * BLOCK_ENTRIES)
+
+# Pieces of the promotion field of the movements. 0 is not a promotion
+PROMOTION_PIECES = (None, Knight, Bishop, Rook, Queen)
+MAX_WEIGHT = 0xFFFF
+
+
+@dataclass
+class BookMove:
+    """Movement of a book, with its weight
+
+    Attributes:
+        move (Movement): Movement in the position looked up
+        weight (int): Relative frequency of the movement
+    """
+
+    move: object
+    weight: int
+
+
+def encode_book_move(move):
+    """Return the Polyglot code of a Movement
+
+    Castlings are encoded as the king moving to the rook square.
+    """
+    origin_row, origin_col = move.origin
+    target_row, target_col = move.target
+    if isinstance(move, Castling):
+        target_col = 7 if target_col > origin_col else 0
+
+    promotion = 0
+    if isinstance(move, Promotion):
+        promotion = PROMOTION_PIECES.index(move.promotes_to)
+
+    return (
+        target_col
+        | (7 - target_row) << 3
+        | origin_col << 6
+        | (7 - origin_row) << 9
+        | promotion << 12
+    )
+
+
+def decode_book_move(game, code):
+    """Return the Movement of a Polyglot code in the current position
+
+    The Movement is built with 'process_move', and is not validated.
+
+    Arguments:
+        game (ChessGame): Game at the position of the book entry
+        code (int): Polyglot movement code
+    """
+    origin = (7 - (code >> 9 & 7), code >> 6 & 7)
+    target = (7 - (code >> 3 & 7), code & 7)
+
+    # Castlings are stored as the king capturing its own rook
+    if isinstance(game[origin], King) and origin[0] == target[0]:
+        if abs(target[1] - origin[1]) > 2:
+            target = (target[0], 6 if target[1] > origin[1] else 2)
+
+    move = game.process_move(origin, target)
+    promotion = code >> 12 & 7
+    if isinstance(move, Promotion) and promotion:
+        move.promotes_to = PROMOTION_PIECES[promotion]
+    return move
+
+
+class OpeningBook:
+    """Read-only opening book, memory-mapped from a file
+
+    Only the first key of each block of entries is kept in memory. A
+    lookup bisects those keys, and then the keys of a single block read
+    from the memory map.
+
+    Arguments:
+        path (str): Path of the book file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size % ENTRY.size:
+            self._file.close()
+            raise ValueError(f"Invalid book size ({size} bytes): {path!r}")
+
+        self.entries = size // ENTRY.size
+        self._map = None
+        self._index = []
+        if self.entries:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            block_size = BLOCK_ENTRIES * ENTRY.size
+            self._index = [
+                KEY.unpack_from(self._map, offset)[0]
+                for offset in range(0, size, block_size)
+            ]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.entries
+
+    def _first_index(self, key):
+        """Index of the first entry with a key not lower than 'key'"""
+        block = bisect_left(self._index, key) - 1
+        if block < 0:
+            return 0
+
+        first = block * BLOCK_ENTRIES
+        if first + BLOCK_ENTRIES <= self.entries:
+            keys = BLOCK_KEYS.unpack_from(self._map, first * ENTRY.size)
+        else:
+            keys = [
+                KEY.unpack_from(self._map, index * ENTRY.size)[0]
+                for index in range(first, self.entries)
+            ]
+        return first + bisect_left(keys, key)
+
+    def lookup(self, key):
+        """Return the raw entries of a position key
+
+        Arguments:
+            key (int): Position key
+
+        Return:
+            A list with (movement code, weight, learn) tuples
+        """
+        if self._map is None:
+            return []
+
+        entries = []
+        for index in range(self._first_index(key), self.entries):
+            entry_key, code, weight, learn = ENTRY.unpack_from(
+                self._map, index * ENTRY.size
+            )
+            if entry_key != key:
+                break
+            entries.append((code, weight, learn))
+        return entries
+
+    def moves(self, game):
+        """Return the legal book movements of the current position
+
+        Arguments:
+            game (ChessGame): Game to look up
+
+        Return:
+            A list of BookMove, from the highest to the lowest weight
+        """
+        book_moves = []
+        for code, weight, _ in self.lookup(polyglot_key(game)):
+            move = decode_book_move(game, code)
+            if (
+                move.is_valid()
+                and move.piece.color == game.player
+                and game.leaves_king_safe(move)
+            ):
+                book_moves.append(BookMove(move, weight))
+
+        book_moves.sort(key=lambda book_move: book_move.weight, reverse=True)
+        return book_moves
+
+    def choose(self, game, rng=random):
+        """Pick a book movement at random, following the weights
+
+        Arguments:
+            game (ChessGame): Game to look up
+            rng (random.Random): Source of randomness
+
+        Return:
+            A Movement, or None if the position is not in the book
+        """
+        book_moves = [book_move for book_move in self.moves(game) if book_move.weight]
+        if not book_moves:
+            return None
+
+        weights = [book_move.weight for book_move in book_moves]
+        return rng.choices(book_moves, weights)[0].move
+
+
+def build_book(games, max_plies=20):
+    """Count the movements played in the first plies of PGN games
+
+    Games with invalid movements are used up to the first error, and
+    games with an invalid FEN header are skipped.
+
+    Arguments:
+        games (Iterable[PgnGame]): Games to learn from
+        max_plies (int): Plies of each game added to the book
+
+    Return:
+        A list of (position key, movement code, weight) tuples, sorted
+        by position key and weight
+    """
+    counts = Counter()
+    game = ChessGame(claim_draws=False)
+    for pgn_game in games:
+        fen = pgn_game.headers.get("FEN")
+        try:
+            game.load_fen(fen or STARTING_FEN)
+        except ValueError:
+            continue
+
+        for san in pgn_game.moves[:max_plies]:
+            try:
+                move = parse_san(game, san)
+            except PgnError:
+                break
+
+            key = polyglot_key(game)
+            if not game.make_move(move):
+                break
+            counts[key, encode_book_move(move)] += 1
+
+    # Weights are scaled down to fit in 16 bits
+    scale = max(1, -(-max(counts.values(), default=0) // MAX_WEIGHT))
+    return sorted(
+        ((key, code, max(1, count // scale)) for (key, code), count in counts.items()),
+        key=lambda entry: (entry[0], -entry[2]),
+    )
+
+
+def write_book(path, entries):
+    """Write the entries of a book to a file
+
+    Arguments:
+        path (str): Path of the book file
+        entries (Iterable[tuple[int, int, int]]): (position key,
+            movement code, weight) tuples, sorted by position key
+    """
+    with open(path, "wb") as file:
+        for key, code, weight in entries:
+            file.write(ENTRY.pack(key, code, weight, 0))
+
+
+def main(arguments):
+    """Build a book from PGN files, or list the book movements of a FEN"""
+    usage = "Usage: python3 -m game.book build BOOK PGN ... | probe BOOK [FEN]"
+    if len(arguments) < 2 or arguments[0] not in ("build", "probe"):
+        print(usage, file=sys.stderr)
+        return 2
+
+    command, path, *rest = arguments
+    if command == "build":
+        games = (pgn_game for pgn_path in rest for pgn_game in open_games(pgn_path))
+        entries = build_book(games)
+        write_book(path, entries)
+        print(f"{len(entries)} entries written to {path}")
+        return 0
+
+    game = ChessGame.from_fen(" ".join(rest)) if rest else ChessGame()
+    with OpeningBook(path) as book:
+        book_moves = book.moves(game)
+    total = sum(book_move.weight for book_move in book_moves) or 1
+    for book_move in book_moves:
+        print(f"{book_move.move} {book_move.weight} ({book_move.weight / total:.1%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
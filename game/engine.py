@@ -0,0 +1,465 @@
+import time
+from dataclasses import dataclass, field
+
+from .ordering import MoveOrdering
+from .pieces import King, Knight, Rook, Queen, Bishop, Pawn, Color
+from .tablebase import WIN, LOSS
+from .transposition import TranspositionTable, EXACT, LOWER, UPPER, NO_MOVE
+
+PIECE_VALUES = {
+    Pawn: 100,
+    Knight: 320,
+    Bishop: 330,
+    Rook: 500,
+    Queen: 900,
+    King: 0,
+}
+
+# fmt: off
+# Piece-square tables from the white player perspective, indexed by
+# 'row * 8 + col' (row 0 is the black back rank). Black pieces use the
+# same tables mirrored vertically
+PIECE_SQUARE_TABLES = {
+    Pawn: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ),
+    Knight: (
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ),
+    Bishop: (
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ),
+    Rook: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ),
+    Queen: (
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ),
+    King: (
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ),
+}
+# fmt: on
+
+# Scores above this bound represent a forced mate
+MATE_SCORE = 1_000_000
+MATE_BOUND = MATE_SCORE - 1_000
+# Scores of positions won according to the tablebase, below the mates
+TABLEBASE_SCORE = MATE_BOUND - 1_000
+
+# How many nodes are searched between two checks of the clock. The node
+# limit is checked on every node
+CHECK_INTERVAL = 32
+
+
+def score_to_table(score, ply):
+    """Make mate scores relative to the node before storing them"""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """Make stored mate scores relative to the root again"""
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def tablebase_score(wdl, ply):
+    """Score of a tablebase WDL value, preferring wins closer to the root
+
+    Wins and losses that the fifty-move rule turns into draws are scored
+    as draws.
+    """
+    if wdl == WIN:
+        return TABLEBASE_SCORE - ply
+    if wdl == LOSS:
+        return -TABLEBASE_SCORE + ply
+    return 0
+
+
+def evaluate(game):
+    """Evaluate the position from the perspective of the current player
+
+    The score, in centipawns, is the material balance plus the bonuses
+    of the piece-square tables.
+
+    Arguments:
+        game (ChessGame): Game to evaluate
+    """
+    score = 0
+    for (row, col), piece in game.state.items():
+        if piece is None:
+            continue
+
+        piece_class = type(piece)
+        if piece.color == Color.WHITE:
+            score += PIECE_VALUES[piece_class]
+            score += PIECE_SQUARE_TABLES[piece_class][row * 8 + col]
+        else:
+            score -= PIECE_VALUES[piece_class]
+            score -= PIECE_SQUARE_TABLES[piece_class][(7 - row) * 8 + col]
+
+    return score if game.player == Color.WHITE else -score
+
+
+def decode_line(game, moves):
+    """Return the Movement instances of a line of packed movements
+
+    Arguments:
+        game (ChessGame): Game in the position before the line
+        moves (list[int]): Packed movements of the line
+    """
+    line = []
+    for move in moves:
+        line.append(game.decode_move(move))
+        game.push(move)
+    for _ in moves:
+        game.pop()
+    return line
+
+
+class SearchStopped(Exception):
+    """Raised inside the search when the time or node budget is over"""
+
+
+@dataclass
+class SearchResult:
+    """Outcome of a search
+
+    Attributes:
+        move (Movement | None): Best movement found, None if the player
+            has no legal movements
+        score (int): Score of the best movement, from the perspective of
+            the player to move
+        depth (int): Depth of the last completed iteration
+        principal_variation (list[Movement]): Expected line of play
+        nodes (int): Number of positions visited
+        elapsed (float): Search time, in seconds
+    """
+
+    move: object = None
+    score: int = 0
+    depth: int = 0
+    principal_variation: list = field(default_factory=list)
+    nodes: int = 0
+    elapsed: float = 0.0
+
+
+class Engine:
+    """Negamax alpha-beta search with iterative deepening
+
+    The search walks the packed movements of the game with 'push' and
+    'pop', so the game is left untouched once it returns, even if the
+    search was stopped by the budget.
+
+    Arguments:
+        game (ChessGame): Game to search
+        max_depth (int): Maximum depth of the search, in plies
+        time_limit (Optional[float]): Search time budget, in seconds
+        node_limit (Optional[int]): Maximum number of visited positions
+        table (Optional[TranspositionTable]): Table of the results of
+            previous searches. It can be shared between searches (and
+            engines) of the same game. Defaults to a new 16 MB table
+    """
+
+    def __init__(
+        self, game, max_depth=64, time_limit=None, node_limit=None, table=None
+    ):
+        self.game = game
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.table = table if table is not None else TranspositionTable()
+        self.ordering = MoveOrdering()
+
+        self.nodes = 0
+        self.deadline = None
+        self.stopped = False
+        self.interruptible = False
+
+    def stop(self):
+        """Ask a running search to stop as soon as possible"""
+        self.stopped = True
+
+    def search(self, on_iteration=None):
+        """Search the best movement for the current player
+
+        Each iteration searches one ply deeper, and only the results of
+        completed iterations are kept. The first iteration always runs
+        to completion, so a movement is returned even with a tiny
+        budget.
+
+        Arguments:
+            on_iteration (Optional[Callable[[SearchResult], None]]):
+                Called with the partial result after each iteration
+
+        Return:
+            A SearchResult
+        """
+        start = time.perf_counter()
+        self.nodes = 0
+        self.stopped = False
+        self.deadline = None if self.time_limit is None else start + self.time_limit
+        self.ordering.new_search()
+
+        result = SearchResult()
+        root_moves = self.game.legal_move_codes()
+        if not root_moves:
+            result.score = self._terminal_score(0)
+            return result
+
+        if self.game.tablebase.covers(self.game) and self._tablebase_root(
+            root_moves, result
+        ):
+            result.elapsed = time.perf_counter() - start
+            return result
+
+        for depth in range(1, self.max_depth + 1):
+            self.interruptible = depth > 1
+            try:
+                score, variation = self._search_root(root_moves, depth)
+            except SearchStopped:
+                break
+
+            result.principal_variation = decode_line(self.game, variation)
+            result.move = result.principal_variation[0]
+            result.score = score
+            result.depth = depth
+            result.nodes = self.nodes
+            result.elapsed = time.perf_counter() - start
+
+            if on_iteration is not None:
+                on_iteration(result)
+
+            if abs(score) >= MATE_BOUND or self._out_of_budget():
+                break
+
+            # Search the best movement first in the next iteration
+            root_moves.remove(variation[0])
+            root_moves.insert(0, variation[0])
+
+        result.nodes = self.nodes
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def search_move(self, move, depth, alpha=-MATE_SCORE, beta=MATE_SCORE):
+        """Score a single root movement
+
+        Unlike 'search', the score does not depend on the other root
+        movements, so the root movements can be searched independently,
+        and in any order, with the same results.
+
+        Arguments:
+            move (int): Packed legal movement of the current player
+            depth (int): Depth of the search, in plies, counting the
+                movement itself
+            alpha (int): Lower bound of the search window. Scores not
+                above it are returned as alpha
+            beta (int): Upper bound of the search window. Scores not
+                below it are returned as beta
+
+        Return:
+            The score of the movement for the current player, and the
+            packed principal variation, starting with the movement. The
+            variation is only complete for scores inside the window
+        """
+        self.nodes = 0
+        self.stopped = False
+        self.deadline = None
+        self.interruptible = False
+        self.ordering.new_search()
+
+        # Shallower iterations fill the table used to order the moves
+        self.game.push(move)
+        try:
+            for iteration in range(1, depth + 1):
+                score, variation = self._negamax(iteration - 1, -beta, -alpha, 1)
+        finally:
+            self.game.pop()
+        return -score, [move] + variation
+
+    def _search_root(self, moves, depth):
+        alpha, beta = -MATE_SCORE, MATE_SCORE
+        best_variation = []
+
+        for move in moves:
+            self.game.push(move)
+            try:
+                score, variation = self._negamax(depth - 1, -beta, -alpha, 1)
+            finally:
+                self.game.pop()
+            score = -score
+
+            if score > alpha or not best_variation:
+                alpha = score
+                best_variation = [move] + variation
+
+        return alpha, best_variation
+
+    def _negamax(self, depth, alpha, beta, ply):
+        self.nodes += 1
+        if (
+            self.interruptible
+            and (self.node_limit is not None or self.nodes % CHECK_INTERVAL == 0)
+            and self._out_of_budget()
+        ):
+            raise SearchStopped
+
+        # Any repetition is scored as a draw, as the side ahead would
+        # avoid it
+        if self.game.is_draw(repetitions=2):
+            return 0, []
+
+        tablebase = self.game.tablebase
+        if tablebase.covers(self.game):
+            wdl = tablebase.probe_wdl(self.game)
+            if wdl is not None:
+                return tablebase_score(wdl, ply), []
+
+        if depth == 0:
+            return evaluate(self.game), []
+
+        key = self.game.position_key
+        entry = self.table.probe(key)
+        hash_move = NO_MOVE
+        if entry is not None:
+            entry_depth, bound, score, hash_move = entry
+            score = score_from_table(score, ply)
+
+            if entry_depth >= depth and (
+                bound == EXACT
+                or (bound == LOWER and score >= beta)
+                or (bound == UPPER and score <= alpha)
+            ):
+                return min(max(score, alpha), beta), []
+
+        moves = self.game.legal_move_codes()
+        if not moves:
+            return self._terminal_score(ply), []
+
+        moves = self.ordering.order(self.game, moves, ply, hash_move)
+
+        original_alpha = alpha
+        best_move = NO_MOVE
+        best_variation = []
+        for index, move in enumerate(moves):
+            self.game.push(move)
+            try:
+                score, variation = self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                self.game.pop()
+            score = -score
+
+            if score >= beta:
+                self.ordering.record_cutoff(self.game, move, ply, depth, index)
+                self.table.store(key, depth, LOWER, score_to_table(beta, ply), move)
+                return beta, []
+            if score > alpha:
+                alpha = score
+                best_move = move
+                best_variation = [move] + variation
+
+        bound = EXACT if alpha > original_alpha else UPPER
+        self.table.store(key, depth, bound, score_to_table(alpha, ply), best_move)
+        return alpha, best_variation
+
+    def _tablebase_root(self, moves, result):
+        """Pick the root movement with the tablebase, if it has them all
+
+        The movements are ranked by the WDL value they leave the
+        opponent with, and then by the distance to zeroing, so wins are
+        converted as fast as possible and losses are delayed.
+
+        Return:
+            Whether the result was filled
+        """
+        tablebase = self.game.tablebase
+        best_rank = best_move = None
+        for move in moves:
+            self.game.push(move)
+            try:
+                wdl = self.game.probe_tablebase()
+                if wdl == LOSS and self.game.verify_checkmate(self.game.player):
+                    # Checkmates are closer than any zeroing movement
+                    dtz = 0
+                else:
+                    dtz = tablebase.probe_dtz(self.game)
+            finally:
+                self.game.pop()
+            if wdl is None or dtz is None:
+                return False
+
+            rank = (-wdl, dtz)
+            if best_rank is None or rank > best_rank:
+                best_rank, best_move = rank, move
+
+        result.move = self.game.decode_move(best_move)
+        result.principal_variation = [result.move]
+        result.score = tablebase_score(best_rank[0], 1)
+        result.nodes = self.nodes = len(moves)
+        return True
+
+    def _terminal_score(self, ply):
+        """Score of a position without legal movements
+
+        Checkmates closer to the root are preferred, stalemates are
+        draws.
+        """
+        if self.game.in_check():
+            return -MATE_SCORE + ply
+        return 0
+
+    def _out_of_budget(self):
+        if self.stopped:
+            return True
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            return True
+        return self.deadline is not None and time.perf_counter() >= self.deadline
@@ -0,0 +1,259 @@
+"""Engine player running in a background process
+
+Interactive programs can not search on their main thread without
+freezing. The EnginePlayer searches snapshots of the game in a worker
+process, and its progress and best movements are read back with 'poll',
+which never blocks, so it can be called on every frame. The movements
+are applied by the caller, on its own thread.
+"""
+
+import multiprocessing
+import queue
+import threading
+from dataclasses import dataclass, field, replace
+
+from .engine import Engine
+from .game import ChessGame
+from .moves import Promotion
+from .transposition import TranspositionTable
+
+# Seconds between two checks of the stop requests in the worker process
+STOP_CHECK_INTERVAL = 0.01
+
+
+@dataclass
+class SearchProgress:
+    """Partial result of a background search
+
+    Attributes:
+        depth (int): Depth of the last completed iteration
+        score (int): Score for the player to move in the searched
+            position
+        principal_variation (list[str]): Expected line of play, in
+            coordinate notation
+        nodes (int): Number of positions visited
+        pondering (bool): Whether the search runs on the opponent time
+    """
+
+    depth: int = 0
+    score: int = 0
+    principal_variation: list = field(default_factory=list)
+    nodes: int = 0
+    pondering: bool = False
+
+
+@dataclass
+class EngineMove:
+    """Movement chosen by a background search
+
+    Attributes:
+        origin (tuple[int, int]): Position of the moved piece
+        target (tuple[int, int]): Target position
+        promotes_to (type | None): Piece class of a promotion
+        score (int): Score of the movement
+    """
+
+    origin: tuple
+    target: tuple
+    promotes_to: type | None
+    score: int
+
+    def play(self, game):
+        """Make the movement with 'process_move' and 'make_move'
+
+        Return:
+            Whether the movement was made
+        """
+        move = game.process_move(self.origin, self.target)
+        if isinstance(move, Promotion):
+            move.promotes_to = self.promotes_to
+        return game.make_move(move)
+
+
+def _watch_stop(engine, stop_id, search_id, done):
+    """Stop the engine once a stop of its search is requested"""
+    while not done.wait(STOP_CHECK_INTERVAL):
+        if stop_id.value >= search_id:
+            engine.stop()
+            return
+
+
+def _engine_worker(commands, results, stop_id):
+    """Run the searches sent by an EnginePlayer until it closes"""
+    game = ChessGame()
+    # The table is kept between searches, so pondering fills it
+    table = TranspositionTable()
+
+    while (command := commands.get()) is not None:
+        search_id, snapshot, max_depth, time_limit, pondering = command
+        game.restore(snapshot)
+        engine = Engine(game, max_depth, time_limit, table=table)
+
+        def report(result):
+            results.put(
+                (
+                    "progress",
+                    search_id,
+                    SearchProgress(
+                        result.depth,
+                        result.score,
+                        [str(move) for move in result.principal_variation],
+                        result.nodes,
+                        pondering,
+                    ),
+                )
+            )
+
+        done = threading.Event()
+        watcher = threading.Thread(
+            target=_watch_stop, args=(engine, stop_id, search_id, done), daemon=True
+        )
+        watcher.start()
+        try:
+            result = engine.search(on_iteration=report)
+        finally:
+            done.set()
+            watcher.join()
+
+        move = result.move
+        if move is not None:
+            move = EngineMove(
+                move.origin,
+                move.target,
+                getattr(move, "promotes_to", None),
+                result.score,
+            )
+        results.put(("done", search_id, move))
+
+
+class EnginePlayer:
+    """Engine that searches in a worker process
+
+    The worker process is started on the first search, and keeps its
+    transposition table between searches.
+
+    Arguments:
+        max_depth (int): Maximum depth of the searches
+        time_limit (float): Time budget of the searches for a movement,
+            in seconds. Pondering searches run until stopped
+
+    Attributes:
+        progress (SearchProgress | None): Progress of the last search
+    """
+
+    def __init__(self, max_depth=64, time_limit=2.0):
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.progress = None
+
+        self._process = None
+        self._commands = None
+        self._results = None
+        self._stop_id = None
+        self._search_id = 0
+        # Search whose movement is expected, None while pondering
+        self._thinking_id = None
+
+    @property
+    def thinking(self):
+        """Whether a movement is being searched"""
+        return self._thinking_id is not None
+
+    def _start_process(self):
+        self._commands = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        self._stop_id = multiprocessing.Value("q", 0)
+        self._process = multiprocessing.Process(
+            target=_engine_worker,
+            args=(self._commands, self._results, self._stop_id),
+            daemon=True,
+        )
+        self._process.start()
+
+    def _search(self, game, time_limit, pondering):
+        if self._process is None:
+            self._start_process()
+
+        self.stop()
+        self._search_id += 1
+        self.progress = None
+        # The history is not needed by the search, and holds the game
+        snapshot = replace(game.snapshot(), history=())
+        self._commands.put(
+            (self._search_id, snapshot, self.max_depth, time_limit, pondering)
+        )
+        return self._search_id
+
+    def think(self, game):
+        """Start searching a movement for the current player
+
+        Any running search is stopped. The movement is returned by
+        'poll' once the search ends.
+
+        Arguments:
+            game (ChessGame): Game to search
+        """
+        self._thinking_id = self._search(game, self.time_limit, False)
+
+    def ponder(self, game):
+        """Search the current position until stopped, on the opponent time
+
+        No movement is returned, but the searched positions are kept in
+        the table of the worker, which speeds up the next search.
+
+        Arguments:
+            game (ChessGame): Game to search
+        """
+        self._search(game, None, True)
+        self._thinking_id = None
+
+    def stop(self):
+        """Stop the running search
+
+        A stopped 'think' search still returns the best movement of its
+        completed iterations through 'poll'.
+        """
+        if self._stop_id is not None:
+            self._stop_id.value = self._search_id
+
+    def poll(self):
+        """Read the messages of the worker process, without blocking
+
+        The progress of the current search is stored in 'progress'.
+
+        Return:
+            The EngineMove of the current 'think' search, once it ended,
+            or None
+        """
+        if self._results is None:
+            return None
+
+        best_move = None
+        while True:
+            try:
+                kind, search_id, data = self._results.get_nowait()
+            except queue.Empty:
+                return best_move
+
+            # Messages of searches that were replaced are dropped
+            if search_id != self._search_id:
+                continue
+            if kind == "progress":
+                self.progress = data
+            elif search_id == self._thinking_id:
+                self._thinking_id = None
+                best_move = data
+
+    def close(self):
+        """Stop the worker process"""
+        if self._process is None:
+            return
+
+        self.stop()
+        self._commands.put(None)
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+        self._commands = self._results = self._stop_id = None
+        self._thinking_id = None
@@ -0,0 +1,172 @@
+from dataclasses import dataclass
+
+from .pieces import King, Knight, Rook, Queen, Bishop, Pawn, Color, position_name
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+PIECE_CLASSES = {
+    "k": King,
+    "q": Queen,
+    "r": Rook,
+    "b": Bishop,
+    "n": Knight,
+    "p": Pawn,
+}
+# Castling letters, following the order of the castling rights bits
+CASTLING_LETTERS = "KQkq"
+FILES = "abcdefgh"
+
+
+@dataclass
+class FenPosition:
+    """Position described by a FEN string
+
+    Attributes:
+        pieces (dict[tuple[int, int], tuple[type, Color]]): Piece class
+            and color on each occupied position
+        player (Color): Player to move
+        castling_rights (int): Castling rights bitmask
+        en_passant (tuple[int, int] | None): Square a pawn skipped on the
+            last move, if any
+        halfmove_clock (int): Plies since the last capture or pawn move
+        fullmove_number (int): Number of the current move
+    """
+
+    pieces: dict
+    player: Color
+    castling_rights: int
+    en_passant: tuple | None
+    halfmove_clock: int
+    fullmove_number: int
+
+
+def parse_square(name):
+    """Return the (row, col) position of an algebraic square name"""
+    if len(name) != 2 or name[0] not in FILES or name[1] not in "12345678":
+        raise ValueError(f"Invalid square: {name!r}")
+    return (8 - int(name[1]), FILES.index(name[0]))
+
+
+def parse_fen(fen):
+    """Parse a FEN string
+
+    The halfmove clock and the fullmove number are optional.
+
+    Arguments:
+        fen (str): Position in Forsyth-Edwards Notation
+
+    Return:
+        A FenPosition
+
+    Raises:
+        ValueError: If the string is not a valid FEN, or if a player has
+            not exactly one king
+    """
+    fields = fen.split()
+    if len(fields) not in (4, 6):
+        raise ValueError(f"Invalid FEN, expected 4 or 6 fields: {fen!r}")
+
+    placement, player, castling, en_passant = fields[:4]
+    rows = placement.split("/")
+    if len(rows) != 8:
+        raise ValueError(f"Invalid FEN, expected 8 rows: {fen!r}")
+
+    pieces = {}
+    for row, row_code in enumerate(rows):
+        col = 0
+        for code in row_code:
+            if code.isdigit():
+                col += int(code)
+                continue
+
+            try:
+                piece_class = PIECE_CLASSES[code.lower()]
+            except KeyError:
+                raise ValueError(f"Invalid FEN piece {code!r}: {fen!r}")
+            if col > 7:
+                raise ValueError(f"Invalid FEN, row {row} is too long: {fen!r}")
+
+            color = Color.WHITE if code.isupper() else Color.BLACK
+            pieces[row, col] = (piece_class, color)
+            col += 1
+
+        if col != 8:
+            raise ValueError(f"Invalid FEN, row {row} has not 8 columns: {fen!r}")
+
+    # Checks are only detected on boards with a king of each color
+    for color in Color:
+        kings = list(pieces.values()).count((King, color))
+        if kings != 1:
+            raise ValueError(
+                f"Invalid FEN, {kings} {color.name.lower()} kings: {fen!r}"
+            )
+
+    if player not in ("w", "b"):
+        raise ValueError(f"Invalid FEN player {player!r}: {fen!r}")
+
+    rights = 0
+    if castling != "-":
+        for letter in castling:
+            try:
+                rights |= 1 << CASTLING_LETTERS.index(letter)
+            except ValueError:
+                raise ValueError(f"Invalid FEN castling {castling!r}: {fen!r}")
+
+    try:
+        halfmove_clock, fullmove_number = (int(field) for field in fields[4:] or (0, 1))
+    except ValueError:
+        raise ValueError(f"Invalid FEN move counters: {fen!r}")
+
+    return FenPosition(
+        pieces=pieces,
+        player=Color.WHITE if player == "w" else Color.BLACK,
+        castling_rights=rights,
+        en_passant=None if en_passant == "-" else parse_square(en_passant),
+        halfmove_clock=halfmove_clock,
+        fullmove_number=fullmove_number,
+    )
+
+
+def format_fen(game):
+    """Return the FEN string of the current position of a game
+
+    Arguments:
+        game (ChessGame): Game to export
+    """
+    rows = []
+    for row in range(8):
+        row_code = ""
+        empty = 0
+        for col in range(8):
+            piece = game[row, col]
+            if piece is None:
+                empty += 1
+                continue
+
+            if empty:
+                row_code += str(empty)
+                empty = 0
+            notation = piece.notation
+            row_code += notation.upper() if piece.color == Color.WHITE else notation
+        if empty:
+            row_code += str(empty)
+        rows.append(row_code)
+
+    rights = game.castling_rights()
+    castling = "".join(
+        letter for index, letter in enumerate(CASTLING_LETTERS) if rights & (1 << index)
+    )
+
+    skipped = game.en_passant_square()
+    en_passant = "-" if skipped is None else position_name(skipped)
+
+    return " ".join(
+        (
+            "/".join(rows),
+            "w" if game.player == Color.WHITE else "b",
+            castling or "-",
+            en_passant,
+            str(game.halfmove_clock()),
+            str(game.fullmove_number()),
+        )
+    )
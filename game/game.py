@@ -1,33 +1,286 @@
-from itertools import product
-from .pieces import King, Knight, Rook, Queen, Bishop, Pawn, Color
-from .moves import move_factory
+import copy
+import enum
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from .pieces import (
+    King,
+    Knight,
+    Rook,
+    Queen,
+    Bishop,
+    Pawn,
+    Color,
+    BOARD_SQUARES,
+    piece_from_code,
+)
+from .moves import (
+    move_factory,
+    Promotion,
+    PROMOTION_CHOICES,
+    PROMOTION_MOVE,
+    EN_PASSANT_MOVE,
+    CASTLING_MOVE,
+    MOVE_KIND_MASK,
+)
+from .attacks import AttackMap, is_attacked
+from .bitboard import BitboardState
+from .fen import STARTING_FEN, parse_fen, format_fen
+from .tablebase import Tablebase, LOSS, DRAW
+from . import zobrist
+
+# Positions in the order they are visited by ChessGame.__iter__
+BOARD_POSITIONS = tuple((y, x) for x in range(8) for y in range(8))
+
+# Row of the back rank of each color
+HOME_ROW = {Color.WHITE: 7, Color.BLACK: 0}
+
+# Castling rights, as (color, king square, rook square). The right at
+# index 'i' is the bit 'i' of the castling rights bitmask
+CASTLING_RIGHTS = (
+    (Color.WHITE, (7, 4), (7, 7)),
+    (Color.WHITE, (7, 4), (7, 0)),
+    (Color.BLACK, (0, 4), (0, 7)),
+    (Color.BLACK, (0, 4), (0, 0)),
+)
+ALL_CASTLING_RIGHTS = (1 << len(CASTLING_RIGHTS)) - 1
+# Bit of each (king square, rook square) pair
+CASTLING_RIGHT_BITS = {
+    (king, rook): 1 << index for index, (_, king, rook) in enumerate(CASTLING_RIGHTS)
+}
+# Rights lost when a piece leaves or arrives at each square
+CASTLING_SQUARE_MASKS = {
+    square: sum(
+        bit for squares, bit in CASTLING_RIGHT_BITS.items() if square in squares
+    )
+    for squares in CASTLING_RIGHT_BITS
+    for square in squares
+}
+# Rights of each color
+CASTLING_COLOR_MASKS = {
+    color: sum(
+        1 << index
+        for index, (right_color, _, _) in enumerate(CASTLING_RIGHTS)
+        if right_color == color
+    )
+    for color in Color
+}
+
+# Plies without captures or pawn moves, and occurrences of the same
+# position, that end a game. The automatic limits apply even when the
+# draws are not claimed
+FIFTY_MOVE_PLIES = 100
+SEVENTY_FIVE_MOVE_PLIES = 150
+THREEFOLD_REPETITIONS = 3
+FIVEFOLD_REPETITIONS = 5
+
+# Legal move maps kept by each game, for the most recent positions
+LEGAL_MAP_CACHE_SIZE = 256
+NO_TARGETS = frozenset()
+
+
+class Termination(enum.Enum):
+    """Reason why a game ended"""
+
+    CHECKMATE = "checkmate"
+    STALEMATE = "stalemate"
+    INSUFFICIENT_MATERIAL = "insufficient material"
+    FIFTY_MOVES = "fifty-move rule"
+    SEVENTY_FIVE_MOVES = "seventy-five-move rule"
+    THREEFOLD_REPETITION = "threefold repetition"
+    FIVEFOLD_REPETITION = "fivefold repetition"
+
+
+@dataclass(frozen=True)
+class GameSnapshot:
+    """State of a game, as returned by 'ChessGame.snapshot'
+
+    The board is kept as 64 bytes, with the code of the piece on each
+    square plus one (0 for empty squares). The undo stack and the
+    history share their entries with the game, as those never change
+    once made. Nothing in a snapshot is modified after it is taken.
+    """
+
+    board: bytes
+    player: Color
+    castling_rights: int
+    en_passant: tuple | None
+    en_passant_file: int | None
+    halfmove_clock: int
+    key: int
+    repetitions: dict
+    undo_stack: tuple
+    history: tuple
+    game_over: bool
+    winner: Color | None
+    termination: Termination | None
+    initial_player: Color
+    initial_halfmove_clock: int
+    initial_fullmove_number: int
+
+
+def _bind_move(move, game):
+    """Return a Movement that acts on 'game', copying it if needed"""
+    if move.board is game:
+        return move
+    move = copy.copy(move)
+    move.board = game
+    return move
+
+
+def _castling_rook_squares(king_target):
+    """Return the initial and final squares of the rook in a castling"""
+    row, col = king_target
+    if col == 6:
+        return (row, 7), (row, 5)
+    return (row, 0), (row, 3)
 
 
 class ChessGame:
-    """Implements the core logic and interactions of the Chess game"""
+    """Implements the core logic and interactions of the Chess game
 
-    def __init__(self):
+    Arguments:
+        track_attacks (bool): Keep an AttackMap updated on every change
+            of the board, so the attackers of every square can be
+            inspected. It makes movements slower, so it is meant for
+            analysis and debugging
+        state_class (type): Storage of the board state. Either 'dict'
+            (default) or 'BitboardState'
+        debug_keys (bool): Compare the incrementally updated position
+            key with a full recomputation after every move, raising
+            AssertionError on a mismatch
+        claim_draws (bool): End the game as soon as a draw by the
+            fifty-move rule or threefold repetition can be claimed.
+            Otherwise, only the seventy-five-move rule and fivefold
+            repetition end the game
+        tablebase (Optional[Tablebase]): Endgame tablebase probed by
+            'probe_tablebase' and by the engine. Defaults to one without
+            files, that only knows the draws by insufficient material
+
+    Attributes:
+        game_over (bool): Whether the game has ended
+        winner (Color | None): Winner of the game, None while the game
+            is running or if it ended in a draw
+        termination (Termination | None): Reason why the game ended
+        history (list[Movement]): Movements made with 'make_move' and
+            'apply_move'
+        version (int): Counter increased whenever a movement is made or
+            undone, or a new position is set, so views can tell when to
+            redraw the board. Movements pushed and popped by searches
+            leave it unchanged
+    """
+
+    def __init__(
+        self,
+        track_attacks=False,
+        state_class=dict,
+        debug_keys=False,
+        claim_draws=True,
+        tablebase=None,
+    ):
+        self.track_attacks = track_attacks
+        self.state_class = state_class
+        self.debug_keys = debug_keys
+        self.claim_draws = claim_draws
+        self.tablebase = tablebase if tablebase is not None else Tablebase()
+        self.version = 0
         self.new_game()
 
-    def new_game(self, state_file="assets/initial_position.txt"):
+    def new_game(self, state_file=None, player=Color.WHITE):
         """Starts a new game with the given initial state
 
         The state should be the path to a text file with 8 rows and 8
-        columns, with each character representing a piece.
+        columns, with each character representing a piece, or an
+        iterable with those rows. Kings and rooks on their initial
+        squares can castle. If no state is given, the standard initial
+        position is loaded without touching the filesystem.
+
+        Arguments:
+            state_file (Optional[str | Iterable[str]]): path to the
+                state file, or the rows of the state
+            player (Color): Player to move first
+        """
+        if state_file is None:
+            self.load_fen(STARTING_FEN)
+            return
+
+        self._reset(player)
+
+        # Loads the initial state file
+        if isinstance(state_file, str):
+            with open(state_file) as state:
+                self._load_rows(state)
+        else:
+            self._load_rows(state_file)
+
+        self._prepare_state(ALL_CASTLING_RIGHTS)
+
+    @classmethod
+    def from_fen(cls, fen, **kwargs):
+        """Create a game starting at the position of a FEN string
+
+        Arguments:
+            fen (str): Position in Forsyth-Edwards Notation
+            kwargs: Arguments of the ChessGame constructor
+        """
+        game = cls(**kwargs)
+        game.load_fen(fen)
+        return game
+
+    def load_fen(self, fen):
+        """Start a new game at the position of a FEN string
+
+        The en passant square is kept if a pawn can have skipped it, so
+        EnPassant movements can capture the pawn.
 
         Arguments:
-            state_file (str): path to the state file
+            fen (str): Position in Forsyth-Edwards Notation
 
-        ToDo:
-            - Change API to receive an iterable instead of a path to a
-            file
+        Raises:
+            ValueError: If the string is not a valid FEN
         """
+        position = parse_fen(fen)
+        self._reset(position.player)
+        self.initial_halfmove_clock = position.halfmove_clock
+        self.initial_fullmove_number = position.fullmove_number
+
+        for piece_position, (piece_class, color) in position.pieces.items():
+            self._put_initial_piece(piece_class(color), piece_position)
+
+        if position.en_passant is not None:
+            row, col = position.en_passant
+            enemy = Color.BLACK if position.player == Color.WHITE else Color.WHITE
+            pawn = self.state.get((row + enemy.value, col))
+            if isinstance(pawn, Pawn) and pawn.color == enemy:
+                self._en_passant = position.en_passant
+
+        self._prepare_state(position.castling_rights)
+
+    def to_fen(self):
+        """Return the FEN string of the current position"""
+        return format_fen(self)
 
-        self.state = {}
-        self.player = Color.WHITE
+    def _reset(self, player):
+        self.version += 1
+        self.state = self.state_class()
+        self.player = player
         self.history = []
         self.game_over = False
         self.winner = None
+        self.termination = None
+        self.white_king_pos = None
+        self.black_king_pos = None
+
+        # Board state that can not be recovered from the pieces, and the
+        # stack to restore it when popping movements
+        self._en_passant = None
+        self._halfmove_clock = 0
+        self._undo_stack = []
+        self._legal_maps = OrderedDict()
+
+        self.initial_player = player
+        self.initial_halfmove_clock = 0
+        self.initial_fullmove_number = 1
 
         self.piece_dict = {
             "r": Rook,
@@ -38,33 +291,174 @@ class ChessGame:
             "p": Pawn,
         }
 
-        # Loads the initial state file
-        with open(state_file) as state:
-            for r, row in enumerate(state):
-                for c, piece_code in enumerate(row):
-                    try:
-                        piece_class = self.piece_dict[piece_code.lower()]
-                    except:
-                        continue
+    def _prepare_state(self, castling_rights):
+        # Rights are only kept for kings and rooks on their squares
+        self._castling_rights = 0
+        for index, (color, king_position, rook_position) in enumerate(CASTLING_RIGHTS):
+            if (
+                castling_rights & (1 << index)
+                and self.state.get(king_position) == King(color)
+                and self.state.get(rook_position) == Rook(color)
+            ):
+                self._castling_rights |= 1 << index
 
-                    piece_color = Color.WHITE if piece_code.islower() else Color.BLACK
-                    piece = piece_class(piece_color)
-                    self.state[r, c] = piece_class(piece_color)
+        self.attack_map = AttackMap(self) if self.track_attacks else None
+        # Gives direct access to the bitboards, if the state has them
+        self.bitboards = self.state if isinstance(self.state, BitboardState) else None
+        self._en_passant_file = self.en_passant_file()
+        self._halfmove_clock = self.initial_halfmove_clock
+        self._key = zobrist.compute_key(self)
 
-                    # Save king positions to allow for efficient detection of checks
-                    match piece:
-                        case King(color=Color.WHITE):
-                            self.white_king_pos = (r, c)
-                        case King(color=Color.BLACK):
-                            self.black_king_pos = (r, c)
+        # Occurrences of each position key, to detect repetitions
+        self._repetitions = {self._key: 1}
+
+        # Positions can be loaded after the game ended
+        self._update_termination()
+
+    def _load_rows(self, rows):
+        for r, row in enumerate(rows):
+            for c, piece_code in enumerate(row):
+                try:
+                    piece_class = self.piece_dict[piece_code.lower()]
+                except:
+                    continue
+
+                piece_color = Color.WHITE if piece_code.islower() else Color.BLACK
+                self._put_initial_piece(piece_class(piece_color), (r, c))
+
+    def _put_initial_piece(self, piece, position):
+        self.state[position] = piece
+
+        # Save king positions to allow for efficient detection of checks
+        match piece:
+            case King(color=Color.WHITE):
+                self.white_king_pos = position
+            case King(color=Color.BLACK):
+                self.black_king_pos = position
 
     def __getitem__(self, position):
         return self.state.get(position)
 
+    @property
+    def position_key(self):
+        """64-bit Zobrist key of the current position
+
+        It covers the piece placement, the player to move, the castling
+        rights and the en passant file, and is updated incrementally as
+        the pieces are moved.
+        """
+        if self.debug_keys:
+            self._verify_key()
+        return self._key
+
+    def _verify_key(self):
+        expected = zobrist.compute_key(self)
+        if self._key != expected:
+            raise AssertionError(
+                f"Incremental position key {self._key:#018x} differs from the "
+                f"recomputed key {expected:#018x}"
+            )
+
+    def castling_rights(self, color=None):
+        """Return the castling rights bitmask of the position
+
+        A right is lost once a piece leaves or arrives at the initial
+        square of the king or the rook involved. The bits follow the
+        order of CASTLING_RIGHTS.
+
+        Arguments:
+            color (Optional[Color]): Only return the rights of this
+                player. Defaults to the rights of both players
+        """
+        if color is None:
+            return self._castling_rights
+        return self._castling_rights & CASTLING_COLOR_MASKS[color]
+
+    def has_castling_right(self, king_position, rook_position):
+        """Check if a king and a rook can still castle together
+
+        Arguments:
+            king_position (tuple[int, int]): Initial square of the king
+            rook_position (tuple[int, int]): Initial square of the rook
+        """
+        bit = CASTLING_RIGHT_BITS.get((king_position, rook_position), 0)
+        return bool(self._castling_rights & bit)
+
+    @property
+    def history(self):
+        # Clones share the history of the game they were made from,
+        # until it is read
+        if self._shared_history is not None:
+            self._history = [_bind_move(move, self) for move in self._shared_history]
+            self._shared_history = None
+        return self._history
+
+    @history.setter
+    def history(self, moves):
+        self._history = moves
+        self._shared_history = None
+
+    @property
+    def last_move(self):
+        """Last movement made, or None at the start of the game"""
+        return self.history[-1] if self.history else None
+
+    def halfmove_clock(self):
+        """Return the number of plies since the last capture or pawn move"""
+        return self._halfmove_clock
+
+    def repetitions(self):
+        """Return how many times the current position has occurred
+
+        Positions are compared by their position key, so they repeat
+        when the pieces, the player to move, the castling rights and the
+        en passant file are the same.
+        """
+        return self._repetitions.get(self._key, 0)
+
+    def _count_position(self, change):
+        count = self._repetitions.get(self._key, 0) + change
+        if count:
+            self._repetitions[self._key] = count
+        else:
+            del self._repetitions[self._key]
+
+    def fullmove_number(self):
+        """Return the number of the current move, starting at 1"""
+        history = (
+            self._history if self._shared_history is None else self._shared_history
+        )
+        plies = len(history) + (self.initial_player == Color.BLACK)
+        return self.initial_fullmove_number + plies // 2
+
+    def en_passant_square(self):
+        """Return the square skipped by the last movement, if it was a
+        two squares pawn advance. Return None otherwise.
+        """
+        return self._en_passant
+
+    def en_passant_file(self):
+        """Return the column where an en passant capture is possible
+
+        That is the case when the last move was a two squares pawn
+        advance next to an enemy pawn. Return None otherwise.
+        """
+        if self._en_passant is None:
+            return None
+
+        row, col = self._en_passant
+        # The pawn is one square past the skipped one
+        pawn_row = 4 if row == 5 else 3
+        pawn = self.state.get((pawn_row, col))
+
+        for neighbour in (self[pawn_row, col - 1], self[pawn_row, col + 1]):
+            if isinstance(neighbour, Pawn) and neighbour.color != pawn.color:
+                return col
+        return None
+
     def __iter__(self):
-        for x in range(8):
-            for y in range(8):
-                yield (y, x), self.state.get((y, x))
+        for position in BOARD_POSITIONS:
+            yield position, self.state.get(position)
 
     def process_move(self, origin, target):
         """Returns a Movement instance that moves a piece from the
@@ -85,14 +479,17 @@ class ChessGame:
 
         Arguments:
             move (Movement): Movement to be executed
+
+        Return:
+            Whether the movement was executed
         """
 
         if self.game_over:
-            return
+            return False
 
         # Invalid moves or from the wrong player are not processed
         if not move.is_valid() or move.piece.color != self.player:
-            return
+            return False
 
         move.do()
         self.history.append(move)
@@ -101,13 +498,34 @@ class ChessGame:
         king_pos = self._get_king_position(self.player)
         if self.verify_check(king_pos, self.player):
             self.undo_move(swap_player=False)
-        else:
-            last_player = self.player
-            self._change_player()
+            return False
+
+        self._change_player()
+        self._count_position(1)
+        self.version += 1
+
+        if self.debug_keys:
+            self._verify_key()
+
+        self._update_termination()
+        return True
+
+    def apply_move(self, move):
+        """Execute a movement known to be legal
 
-            if self.verify_checkmate(self.player):
-                self.winner = last_player
-                self.game_over = True
+        Unlike 'make_move', the movement is not validated and the game
+        over conditions are not checked. It is meant for search code
+        walking movements returned by 'legal_moves', which can be undone
+        with 'undo_move'.
+
+        Arguments:
+            move (Movement): Legal movement of the current player
+        """
+        move.do()
+        self.history.append(move)
+        self._change_player()
+        self._count_position(1)
+        self.version += 1
 
     def _get_king_position(self, player):
         """Return the king position of the requested player
@@ -134,19 +552,230 @@ class ChessGame:
         except IndexError:
             return
 
+        # Only movements that swapped players reached a new position
+        if swap_player:
+            self._count_position(-1)
+
         last_move.undo()
+        self.version += 1
+        self.game_over = False
+        self.winner = None
+        self.termination = None
+
+        if swap_player:
+            self._change_player()
+
+        if self.debug_keys:
+            self._verify_key()
+
+    def push(self, move, swap_player=True):
+        """Make a packed movement, without any validation
+
+        The movement is described by an int, as built by 'encode_move'
+        or returned by 'legal_move_codes', and no Movement instance is
+        created. What is needed to undo it is kept in a stack, so it
+        can be undone with 'pop'. The history is not changed.
+
+        Arguments:
+            move (int): Packed movement of the current player
+            swap_player (bool): Control whether to swap players after
+                the movement is made
+        """
+        state = self.state
+        origin = BOARD_SQUARES[move & 63]
+        target = BOARD_SQUARES[move >> 6 & 63]
+        kind = move & MOVE_KIND_MASK
+        piece = state.get(origin)
+
+        captured_position = target
+        if kind == EN_PASSANT_MOVE:
+            captured_position = (origin[0], target[1])
+        captured_piece = state.get(captured_position)
+
+        self._undo_stack.append(
+            (
+                move,
+                piece,
+                captured_piece,
+                self._castling_rights,
+                self._en_passant,
+                self._halfmove_clock,
+            )
+        )
+
+        if kind == EN_PASSANT_MOVE:
+            self.place_piece(None, captured_position)
+        self.move_piece(piece, origin, target)
+
+        if kind == PROMOTION_MOVE:
+            promotes_to = PROMOTION_CHOICES[move >> 12 & 3]
+            self.place_piece(promotes_to(piece.color), target)
+        elif kind == CASTLING_MOVE:
+            rook_origin, rook_target = _castling_rook_squares(target)
+            self.move_piece(state.get(rook_origin), rook_origin, rook_target)
+
+        self._set_castling_rights(
+            self._castling_rights
+            & ~(
+                CASTLING_SQUARE_MASKS.get(origin, 0)
+                | CASTLING_SQUARE_MASKS.get(target, 0)
+            )
+        )
+
+        self._en_passant = None
+        if type(piece) is Pawn:
+            self._halfmove_clock = 0
+            if abs(target[0] - origin[0]) == 2:
+                self._en_passant = ((origin[0] + target[0]) // 2, origin[1])
+        elif captured_piece is not None:
+            self._halfmove_clock = 0
+        else:
+            self._halfmove_clock += 1
 
         if swap_player:
             self._change_player()
+            self._count_position(1)
+
+    def pop(self, swap_player=True):
+        """Undo the last movement made by 'push'
+
+        Arguments:
+            swap_player (bool): Control whether to swap players after
+                the movement is undone
+
+        Return:
+            The packed movement undone
+
+        Raises:
+            IndexError: If there are no movements to undo
+        """
+        if swap_player:
+            self._count_position(-1)
+
+        move, piece, captured_piece, castling_rights, en_passant, halfmove_clock = (
+            self._undo_stack.pop()
+        )
+        origin = BOARD_SQUARES[move & 63]
+        target = BOARD_SQUARES[move >> 6 & 63]
+        kind = move & MOVE_KIND_MASK
+
+        if kind == CASTLING_MOVE:
+            rook_origin, rook_target = _castling_rook_squares(target)
+            self.move_piece(self.state.get(rook_target), rook_target, rook_origin)
+
+        self.move_piece(piece, target, origin)
+        if kind == EN_PASSANT_MOVE:
+            self.place_piece(captured_piece, (origin[0], target[1]))
+        elif captured_piece is not None:
+            self.place_piece(captured_piece, target)
+
+        self._set_castling_rights(castling_rights)
+        self._en_passant = en_passant
+        self._halfmove_clock = halfmove_clock
+
+        if swap_player:
+            self._change_player()
+        return move
+
+    def snapshot(self):
+        """Return the current state of the game, to be restored later
+
+        Taking a snapshot copies the board to 64 bytes and the stacks of
+        the game to tuples, without copying the Movements or the pieces.
+
+        Return:
+            A GameSnapshot
+        """
+        board = bytearray(64)
+        for (row, col), piece in self.state.items():
+            if piece is not None:
+                board[row * 8 + col] = piece.code + 1
+
+        history = self._shared_history
+        if history is None:
+            history = tuple(self._history)
+
+        return GameSnapshot(
+            board=bytes(board),
+            player=self.player,
+            castling_rights=self._castling_rights,
+            en_passant=self._en_passant,
+            en_passant_file=self._en_passant_file,
+            halfmove_clock=self._halfmove_clock,
+            key=self._key,
+            repetitions=dict(self._repetitions),
+            undo_stack=tuple(self._undo_stack),
+            history=history,
+            game_over=self.game_over,
+            winner=self.winner,
+            termination=self.termination,
+            initial_player=self.initial_player,
+            initial_halfmove_clock=self.initial_halfmove_clock,
+            initial_fullmove_number=self.initial_fullmove_number,
+        )
+
+    def restore(self, snapshot):
+        """Return the game to the state of a snapshot
+
+        The snapshot can come from another game, and can be restored any
+        number of times. The Movements of its history are only copied
+        to this game when the history is read.
+
+        Arguments:
+            snapshot (GameSnapshot): State returned by 'snapshot'
+        """
+        self.version += 1
+        self.state = self.state_class()
+        for index, code in enumerate(snapshot.board):
+            if code:
+                self._put_initial_piece(piece_from_code(code - 1), BOARD_SQUARES[index])
+
+        self.player = snapshot.player
+        self._castling_rights = snapshot.castling_rights
+        self._en_passant = snapshot.en_passant
+        self._en_passant_file = snapshot.en_passant_file
+        self._halfmove_clock = snapshot.halfmove_clock
+        self._key = snapshot.key
+        self._repetitions = dict(snapshot.repetitions)
+        self._undo_stack = list(snapshot.undo_stack)
+        self._history = None
+        self._shared_history = snapshot.history
+        self.game_over = snapshot.game_over
+        self.winner = snapshot.winner
+        self.termination = snapshot.termination
+        self.initial_player = snapshot.initial_player
+        self.initial_halfmove_clock = snapshot.initial_halfmove_clock
+        self.initial_fullmove_number = snapshot.initial_fullmove_number
+
+        self.attack_map = AttackMap(self) if self.track_attacks else None
+        self.bitboards = self.state if isinstance(self.state, BitboardState) else None
+        self._legal_maps = OrderedDict()
+
+    def clone(self):
+        """Return an independent copy of the game
+
+        The copy shares the pieces and, until it is read, the history of
+        this game, so games can be forked cheaply.
+        """
+        game = object.__new__(type(self))
+        game.track_attacks = self.track_attacks
+        game.state_class = self.state_class
+        game.debug_keys = self.debug_keys
+        game.claim_draws = self.claim_draws
+        game.tablebase = self.tablebase
+        game.piece_dict = self.piece_dict
+        game.version = 0
+        game.restore(self.snapshot())
+        return game
 
     def move_piece(self, piece, from_position, to_position):
         """Moves a piece from position one position to another
 
-        This method is meant to be called only by Movement instances,
-        while they are executing. When called, the 'from_position' is
-        set to None and the given piece is placed in 'to_position',
-        regardless of what is on any of the positions. This method
-        performs no validation of the applied movements
+        This method is meant to be called only while making or undoing
+        movements. When called, the 'from_position' is set to None and
+        the given piece is placed in 'to_position', regardless of what
+        is on any of the positions. This method performs no validation
+        of the applied movements
 
         Arguments:
             piece (Piece): piece to place in the 'to_position'
@@ -155,7 +784,6 @@ class ChessGame:
         """
         self.place_piece(None, from_position)
         self.place_piece(piece, to_position)
-        piece.has_moved = True
 
         # Keeping track of kings' positions for performance reasons
         if isinstance(piece, King):
@@ -165,8 +793,24 @@ class ChessGame:
                 self.black_king_pos = to_position
 
     def place_piece(self, piece, position):
+        old_piece = self.state.get(position)
+        if old_piece is not None:
+            self._key ^= zobrist.piece_key(old_piece, position)
+
         self.state[position] = piece
 
+        if piece is not None:
+            self._key ^= zobrist.piece_key(piece, position)
+
+        if self.attack_map is not None:
+            self.attack_map.update(position)
+
+    def _set_castling_rights(self, rights):
+        if rights != self._castling_rights:
+            self._key ^= zobrist.castling_key(self._castling_rights)
+            self._key ^= zobrist.castling_key(rights)
+            self._castling_rights = rights
+
     def _change_player(self):
         """Swap the current player"""
 
@@ -174,6 +818,15 @@ class ChessGame:
             self.player = Color.BLACK
         else:
             self.player = Color.WHITE
+        self._key ^= zobrist.SIDE_KEY
+
+        # The en passant file is only updated when the turn changes, as
+        # movements undone without swapping players restore it
+        en_passant_file = self.en_passant_file()
+        if en_passant_file != self._en_passant_file:
+            self._key ^= zobrist.en_passant_key(self._en_passant_file)
+            self._key ^= zobrist.en_passant_key(en_passant_file)
+            self._en_passant_file = en_passant_file
 
     def verify_check(self, position, color):
         """Check if the a position is being attacked by the opponent
@@ -182,15 +835,276 @@ class ChessGame:
             position (tuple[int, int]): Position to check for attacks
             color (Color): allied color
         """
-        for piece_position, piece in self:
-            # Ignore empty squares and allied pieces
-            if piece is None or piece.color == color:
+        if self.attack_map is not None:
+            return self.attack_map.is_attacked(position, color)
+        if self.bitboards is not None:
+            return self.bitboards.is_attacked(position, color)
+        return is_attacked(self, position, color)
+
+    def in_check(self, color=None):
+        """Check if the king of a player is being attacked
+
+        Arguments:
+            color (Optional[Color]): Player to check. Defaults to the
+                current player
+        """
+        color = color or self.player
+        return self.verify_check(self._get_king_position(color), color)
+
+    def pseudo_legal_moves(self, origin):
+        """Return the valid movements of the piece at 'origin'
+
+        The candidate targets come from the piece rays and jumps, so
+        only reachable squares are turned into Movement instances. The
+        movements may still leave the king in check. Promotions are
+        returned once for each piece the pawn can promote to, with the
+        'promotes_to' field already set.
+
+        Arguments:
+            origin (tuple[int, int]): Position of the piece to move
+        """
+        piece = self.state.get(origin)
+        if piece is None:
+            return []
+
+        moves = []
+        for target in piece.targets(origin, self):
+            move = self.process_move(origin, target)
+            if not move.is_valid():
+                continue
+
+            if isinstance(move, Promotion):
+                for promotes_to in PROMOTION_CHOICES:
+                    promotion = self.process_move(origin, target)
+                    promotion.promotes_to = promotes_to
+                    moves.append(promotion)
+            else:
+                moves.append(move)
+        return moves
+
+    def legal_moves(self, color=None):
+        """Return all the legal movements of a player
+
+        Arguments:
+            color (Optional[Color]): Player to generate the movements
+                for. Defaults to the current player
+        """
+        return [self.decode_move(move) for move in self.legal_move_codes(color)]
+
+    def legal_move_map(self):
+        """Return the targets of the legal movements of each piece
+
+        The map is computed once per position, and the maps of the most
+        recent positions are kept, keyed by position key. Making or
+        undoing movements changes the key, so the map always follows
+        the current position, and undoing a movement finds the map of
+        the previous position again. Starting a new game clears them.
+
+        Return:
+            A dict from the origin of each piece of the current player
+            with legal movements to the frozenset of its targets. It
+            must not be modified
+        """
+        key = self._key
+        legal_map = self._legal_maps.get(key)
+        if legal_map is not None:
+            self._legal_maps.move_to_end(key)
+            return legal_map
+
+        targets = {}
+        for move in self._iter_legal_codes(self.player):
+            origin = BOARD_SQUARES[move & 63]
+            targets.setdefault(origin, set()).add(BOARD_SQUARES[move >> 6 & 63])
+        legal_map = {origin: frozenset(squares) for origin, squares in targets.items()}
+
+        self._legal_maps[key] = legal_map
+        if len(self._legal_maps) > LEGAL_MAP_CACHE_SIZE:
+            self._legal_maps.popitem(last=False)
+        return legal_map
+
+    def legal_targets(self, origin):
+        """Return the squares the piece on 'origin' can legally move to
+
+        It is a lookup in the legal move map of the position, so it can
+        be called on every frame. Pieces of the opponent, empty squares
+        and finished games have no targets.
+
+        Arguments:
+            origin (tuple[int, int]): Position of the piece
+        """
+        if self.game_over:
+            return NO_TARGETS
+        return self.legal_move_map().get(origin, NO_TARGETS)
+
+    def legal_move_codes(self, color=None):
+        """Return all the legal movements of a player, packed in ints
+
+        No Movement instances are created, so it is meant for code
+        walking the movements with 'push' and 'pop', like searches.
+
+        Arguments:
+            color (Optional[Color]): Player to generate the movements
+                for. Defaults to the current player
+        """
+        return list(self._iter_legal_codes(color or self.player))
+
+    def _iter_legal_codes(self, color):
+        origins = [
+            (position, piece)
+            for position, piece in self.state.items()
+            if piece is not None and piece.color == color
+        ]
+
+        for origin, piece in origins:
+            for move in self._pseudo_legal_codes(origin, piece):
+                self.push(move, swap_player=False)
+                # The king can also be the moved piece
+                in_check = self.verify_check(self._get_king_position(color), color)
+                self.pop(swap_player=False)
+                if not in_check:
+                    yield move
+
+    def _pseudo_legal_codes(self, origin, piece):
+        state = self.state
+        origin_index = origin[0] * 8 + origin[1]
+        piece_class = type(piece)
+
+        for target in piece.targets(origin, self):
+            captured_piece = state.get(target)
+            if captured_piece is not None and captured_piece.color == piece.color:
                 continue
 
-            move = self.process_move(piece_position, position)
-            if move.is_valid():
-                return True
-        return False
+            move = origin_index | (target[0] * 8 + target[1]) << 6
+            if piece_class is Pawn:
+                # Diagonal movements to empty squares must be en passant
+                if target[1] != origin[1] and captured_piece is None:
+                    if target != self._en_passant:
+                        continue
+                    captured_pawn = state.get((origin[0], target[1]))
+                    if captured_pawn is None or captured_pawn.color == piece.color:
+                        continue
+                    move |= EN_PASSANT_MOVE
+                elif target[0] in (0, 7):
+                    for index in range(len(PROMOTION_CHOICES)):
+                        yield move | PROMOTION_MOVE | index << 12
+                    continue
+            elif piece_class is King and abs(target[1] - origin[1]) == 2:
+                if not self.can_castle(origin, target):
+                    continue
+                move |= CASTLING_MOVE
+            yield move
+
+    def decode_move(self, move):
+        """Return the Movement instance of a packed movement
+
+        Arguments:
+            move (int): Packed movement, in the current position
+        """
+        movement = self.process_move(
+            BOARD_SQUARES[move & 63], BOARD_SQUARES[move >> 6 & 63]
+        )
+        if isinstance(movement, Promotion):
+            movement.promotes_to = PROMOTION_CHOICES[move >> 12 & 3]
+        return movement
+
+    def captured_piece(self, move):
+        """Return the piece captured by a packed movement, or None
+
+        Arguments:
+            move (int): Packed movement, in the current position
+        """
+        target = BOARD_SQUARES[move >> 6 & 63]
+        if move & MOVE_KIND_MASK == EN_PASSANT_MOVE:
+            return self.state.get((BOARD_SQUARES[move & 63][0], target[1]))
+        return self.state.get(target)
+
+    def can_castle(self, king_position, king_target):
+        """Check if a king can castle to a target square
+
+        The castling right must be kept, the squares between the king
+        and the rook must be empty and the squares the king crosses must
+        not be attacked.
+
+        Arguments:
+            king_position (tuple[int, int]): Position of the king
+            king_target (tuple[int, int]): Target of the king, two
+                columns away
+        """
+        rook_position, _ = _castling_rook_squares(king_target)
+        if not self.has_castling_right(king_position, rook_position):
+            return False
+
+        row = king_position[0]
+        start, end = sorted((king_position[1], rook_position[1]))
+        for col in range(start + 1, end):
+            if self.state.get((row, col)) is not None:
+                return False
+
+        color = self.state.get(king_position).color
+        start, end = sorted((king_position[1], king_target[1]))
+        for col in range(start, end + 1):
+            if self.verify_check((row, col), color):
+                return False
+        return True
+
+    def leaves_king_safe(self, move):
+        """Check if a valid movement does not leave its king in check
+
+        Arguments:
+            move (Movement): Movement to test. It must be valid, as
+                returned by 'pseudo_legal_moves' or accepted by its
+                'is_valid' method
+        """
+        color = move.piece.color
+
+        move.do()
+        # Need to get the king position after the move because the king
+        # can also be the moved piece
+        in_check = self.verify_check(self._get_king_position(color), color)
+        move.undo()
+
+        return not in_check
+
+    def perft(self, depth):
+        """Count the leaf nodes of the legal move tree of a given depth
+
+        The tree is walked with 'push' and 'pop', so the counts can be
+        compared with published results to validate the movement rules.
+
+        Arguments:
+            depth (int): Depth of the tree, in plies
+        """
+        if depth == 0:
+            return 1
+
+        moves = self.legal_move_codes()
+        if depth == 1:
+            return len(moves)
+
+        nodes = 0
+        for move in moves:
+            self.push(move)
+            nodes += self.perft(depth - 1)
+            self.pop()
+        return nodes
+
+    def divide(self, depth):
+        """Return the perft count of each legal move of the position
+
+        Arguments:
+            depth (int): Depth of the tree, in plies, including the
+                root movements
+
+        Return:
+            A list with (Movement, nodes) pairs
+        """
+        results = []
+        for move in self.legal_move_codes():
+            movement = self.decode_move(move)
+            self.push(move)
+            results.append((movement, self.perft(depth - 1)))
+            self.pop()
+        return results
 
     def verify_checkmate(self, color):
         """Verify if the game ended in checkmate
@@ -198,33 +1112,107 @@ class ChessGame:
         Arguments:
             color (Color): color to check if was checkmated
         """
-        allied_pieces = (
-            pos for (pos, piece) in self if piece is not None and piece.color == color
+        return (
+            self.in_check(color) and next(self._iter_legal_codes(color), None) is None
         )
 
-        for piece_position in allied_pieces:
-            can_avoid_mate = self._can_avoid_mate_moving(piece_position, color)
-            if can_avoid_mate:
-                return False
-        return True
+    def verify_stalemate(self, color):
+        """Verify if the game ended in stalemate
+
+        Arguments:
+            color (Color): color to check if has no legal movements,
+                without being in check
+        """
+        return (
+            not self.in_check(color)
+            and next(self._iter_legal_codes(color), None) is None
+        )
 
-    def _can_avoid_mate_moving(self, origin, color):
-        can_avoid_mate = False
+    def probe_tablebase(self):
+        """Return the WDL value of the current position, if it is known
 
-        # Check all valid moves starting in origin
-        for target_position in product(range(8), repeat=2):
-            move = self.process_move(origin, target_position)
-            if not move.is_valid():
+        Positions without legal movements are answered like in
+        'verify_checkmate' and 'verify_stalemate', the others are probed
+        in the tablebase of the game.
+
+        Return:
+            The WDL value for the current player (see 'game.tablebase'),
+            or None if the position is not in the tablebase
+        """
+        if next(self._iter_legal_codes(self.player), None) is None:
+            return LOSS if self.in_check() else DRAW
+        return self.tablebase.probe_wdl(self)
+
+    def is_insufficient_material(self):
+        """Check if neither player has the material to checkmate
+
+        That is the case with only the kings, the kings and a single
+        knight or bishop, or the kings and bishops on squares of the
+        same color.
+        """
+        minor_pieces = []
+        for position, piece in self.state.items():
+            if piece is None or type(piece) is King:
                 continue
+            if type(piece) is not Knight and type(piece) is not Bishop:
+                return False
+            minor_pieces.append((position, piece))
+
+        if len(minor_pieces) <= 1:
+            return True
+        return (
+            all(type(piece) is Bishop for _, piece in minor_pieces)
+            and len({(row + col) % 2 for (row, col), _ in minor_pieces}) == 1
+        )
+
+    def is_draw(self, repetitions=THREEFOLD_REPETITIONS):
+        """Check if the position is a draw, other than by stalemate
+
+        The check does not generate movements, so it is cheap enough to
+        be done on every node of a search.
+
+        Arguments:
+            repetitions (int): Occurrences of the position that make
+                it a draw. Searches can use 2 to avoid any repetition
+        """
+        return (
+            self._halfmove_clock >= FIFTY_MOVE_PLIES
+            or self.repetitions() >= repetitions
+            or self.is_insufficient_material()
+        )
+
+    def _update_termination(self):
+        """Set the game over attributes for the current position"""
+        self.termination = self.detect_termination()
+        self.game_over = self.termination is not None
+        self.winner = None
+        if self.termination == Termination.CHECKMATE:
+            # The player to move is the one checkmated
+            self.winner = Color.BLACK if self.player == Color.WHITE else Color.WHITE
+
+    def detect_termination(self):
+        """Return why the game ended in the current position, or None
+
+        Checkmate and stalemate are checked first, as a checkmate on the
+        last movement allowed by the move rules still wins the game.
+        """
+        if next(self._iter_legal_codes(self.player), None) is None:
+            if self.in_check():
+                return Termination.CHECKMATE
+            return Termination.STALEMATE
+
+        if self.is_insufficient_material():
+            return Termination.INSUFFICIENT_MATERIAL
+
+        repetitions = self.repetitions()
+        if self._halfmove_clock >= SEVENTY_FIVE_MOVE_PLIES:
+            return Termination.SEVENTY_FIVE_MOVES
+        if repetitions >= FIVEFOLD_REPETITIONS:
+            return Termination.FIVEFOLD_REPETITION
 
-            move.do()
-            # Need to get the king position after each move because
-            # the king can also have valid moves
-            king_position = self._get_king_position(color)
-            if not self.verify_check(king_position, color):
-                can_avoid_mate = True
-            move.undo()
-
-            if can_avoid_mate:
-                break
-        return can_avoid_mate
+        if self.claim_draws:
+            if self._halfmove_clock >= FIFTY_MOVE_PLIES:
+                return Termination.FIFTY_MOVES
+            if repetitions >= THREEFOLD_REPETITIONS:
+                return Termination.THREEFOLD_REPETITION
+        return None
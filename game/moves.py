@@ -1,5 +1,35 @@
 from . import pieces
 
+# Pieces a pawn can be promoted to
+PROMOTION_CHOICES = (pieces.Queen, pieces.Rook, pieces.Bishop, pieces.Knight)
+
+
+# Packed movements are 16 bits ints. The origin and target squares
+# ('row * 8 + col') take 6 bits each, followed by the index of the
+# promotion piece in PROMOTION_CHOICES (2 bits) and the kind of the
+# movement (2 bits)
+NORMAL_MOVE = 0
+PROMOTION_MOVE = 1 << 14
+EN_PASSANT_MOVE = 2 << 14
+CASTLING_MOVE = 3 << 14
+MOVE_KIND_MASK = 3 << 14
+
+
+def encode_move(move) -> int:
+    """Pack a movement in an int, as used by 'ChessGame.push'
+
+    Arguments:
+        move (Movement): Movement to pack. Promotions must have the
+            'promotes_to' field set
+    """
+    origin = move.origin[0] * 8 + move.origin[1]
+    target = move.target[0] * 8 + move.target[1]
+    code = origin | target << 6 | move.kind
+
+    if move.kind == PROMOTION_MOVE:
+        code |= PROMOTION_CHOICES.index(move.promotes_to) << 12
+    return code
+
 
 def move_factory(board, piece, origin, target, captured_piece=None) -> "Movement":
     """Create a Movement instance with the given information
@@ -27,9 +57,15 @@ class Movement:
     """Abstracts the movement logic
 
     The movement logic is abstracted using the Command design pattern,
-    allowing movements to be done and undone
+    allowing movements to be done and undone. The board changes are
+    made by 'ChessGame.push' and 'ChessGame.pop' with the packed
+    movement, so movements must be undone in the reverse order they
+    were done.
     """
 
+    # Kind of the movement, in its packed form
+    kind = NORMAL_MOVE
+
     def __init__(self, board, piece, origin, target, captured_piece=None):
         self.board = board
         self.piece = piece
@@ -38,25 +74,18 @@ class Movement:
         self.capture = captured_piece is not None
         self.captured_piece = captured_piece
 
-        self.changes_moved_state = (
-            not self.piece.has_moved if self.piece is not None else True
-        )
+    def __str__(self):
+        return f"{pieces.position_name(self.origin)}{pieces.position_name(self.target)}"
 
     def do(self):
         """Apply the movement to the board"""
 
-        self.board.move_piece(self.piece, self.origin, self.target)
+        self.board.push(encode_move(self), swap_player=False)
 
     def undo(self):
         """Undo the movement, restoring the board state"""
 
-        self.board.move_piece(self.piece, self.target, self.origin)
-
-        if self.capture:
-            self.board.place_piece(self.captured_piece, self.target)
-
-        if self.changes_moved_state:
-            self.piece.has_moved = False
+        self.board.pop(swap_player=False)
 
     def is_valid(self):
         """Check if the movement is valid.
@@ -70,18 +99,16 @@ class Movement:
         if self.origin == self.target:
             return False
 
-        trajectory = self.piece.trajectory(self.origin, self.target, self.capture)
+        between = self.piece.between(self.origin, self.target, self.capture)
 
         # Check if the piece can reach the target position
-        if not trajectory:
+        if between is None:
             return False
 
         # Check if the movement is not blocked
-        for position in trajectory:
-            if position == self.origin or position == self.target:
-                continue
-
-            if self.board[position] is not None:
+        state = self.board.state
+        for position in between:
+            if state.get(position) is not None:
                 return False
 
         # Check if the movement captures an enemy piece
@@ -111,6 +138,8 @@ class EmptyMovement(Movement):
 
 
 class Castling(Movement):
+    kind = CASTLING_MOVE
+
     def __init__(
         self,
         board,
@@ -142,20 +171,6 @@ class Castling(Movement):
         self.final_rook_position = (rook_final_row, rook_final_col)
         self.target_king_position = king_target
 
-        # The castling involves a movement from the rook and from the king
-        self.moves = [
-            Movement(board, self.king, self.king_position, self.target_king_position),
-            Movement(board, self.rook, self.rook_position, self.final_rook_position),
-        ]
-
-    def do(self):
-        for move in self.moves:
-            move.do()
-
-    def undo(self):
-        for move in reversed(self.moves):
-            move.undo()
-
     def is_valid(self):
         if self.king is None or self.rook is None:
             return False
@@ -163,31 +178,7 @@ class Castling(Movement):
         if self.king.color != self.rook.color:
             return False
 
-        if self.king.has_moved or self.rook.has_moved:
-            return False
-
-        if self.king_position[0] != self.rook_position[0]:
-            return False
-
-        # No piece between the king and the rook
-        total_start, total_end = self.king_position[1], self.rook_position[1]
-        if total_start > total_end:
-            total_start, total_end = total_end, total_start
-        for col in range(total_start + 1, total_end):
-            if self.board[self.king_position[0], col] is not None:
-                return False
-
-        # The king path is not being attacked by enemy pieces
-        king_start, king_end = self.king_position[1], self.target_king_position[1]
-        if king_start > king_end:
-            king_start, king_end = king_end, king_start
-
-        for col in range(king_start, king_end + 1):
-            king_path_square = (self.king_position[0], col)
-            if self.board.verify_check(king_path_square, self.king.color):
-                return False
-
-        return True
+        return self.board.can_castle(self.king_position, self.target_king_position)
 
     @staticmethod
     def pre_condition(piece, origin, target, captured_piece) -> bool:
@@ -198,22 +189,13 @@ class Castling(Movement):
 
 
 class EnPassant(Movement):
+    kind = EN_PASSANT_MOVE
+
     def __init__(self, board, piece, origin, target, captured_piece=None):
         super().__init__(board, piece, origin, target, captured_piece)
-        try:
-            self.previous_move = self.board.history[-1]
-            self.captured_piece = self.previous_move.piece
-        except IndexError:
-            self.previous_move = None
-            self.captured_piece = None
-
-    def do(self):
-        self.board.move_piece(self.piece, self.origin, self.target)
-        self.board.place_piece(None, self.previous_move.target)
-
-    def undo(self):
-        self.board.move_piece(self.piece, self.target, self.origin)
-        self.board.place_piece(self.captured_piece, self.previous_move.target)
+        # The captured pawn is beside the origin, not on the target
+        self.captured_position = (origin[0], target[1])
+        self.captured_piece = self.board[self.captured_position]
 
     def is_valid(self):
         if self.captured_piece is None:
@@ -222,24 +204,16 @@ class EnPassant(Movement):
         is_a_pawn_move = isinstance(self.piece, pieces.Pawn)
         captured_piece_is_a_pawn = isinstance(self.captured_piece, pieces.Pawn)
         pieces_with_opposite_colors = self.captured_piece.color != self.piece.color
-        captured_pawn_moved_two_squares = (
-            abs(self.previous_move.target[0] - self.previous_move.origin[0]) == 2
-        )
-        pieces_on_the_same_row = self.previous_move.target[0] == self.origin[0]
-        pieces_will_end_on_same_col = self.target[1] == self.previous_move.origin[1]
-        pieces_on_adjacent_cols = (
-            abs(self.previous_move.target[1] - self.origin[1]) == 1
-        )
+        target_was_skipped = self.target == self.board.en_passant_square()
+        moving_forward = self.target[0] - self.origin[0] == self.piece.color.value
 
         return all(
             [
                 is_a_pawn_move,
                 captured_piece_is_a_pawn,
                 pieces_with_opposite_colors,
-                captured_pawn_moved_two_squares,
-                pieces_on_the_same_row,
-                pieces_will_end_on_same_col,
-                pieces_on_adjacent_cols,
+                target_was_skipped,
+                moving_forward,
             ]
         )
 
@@ -260,20 +234,23 @@ class Promotion(Movement):
     be promoted before calling the 'do' method.
     """
 
+    kind = PROMOTION_MOVE
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.promotes_to = None
 
+    def __str__(self):
+        notation = self.promotes_to.notation if self.promotes_to is not None else ""
+        return super().__str__() + notation
+
     def do(self):
         """Promotes the pawn"""
-        super().do()
-        try:
-            piece = self.promotes_to(color=self.piece.color, has_moved=True)
-            self.board.place_piece(piece, self.target)
-        except TypeError:
+        if self.promotes_to not in PROMOTION_CHOICES:
             raise ValueError(
                 "The field 'promotes_to' must be set before calling the method 'do()'"
             )
+        super().do()
 
     @staticmethod
     def pre_condition(piece, origin, target, captured_piece):
@@ -0,0 +1,161 @@
+from .moves import PROMOTION_CHOICES, PROMOTION_MOVE, MOVE_KIND_MASK
+from .pieces import King, Knight, Rook, Queen, Bishop, Pawn, BOARD_SQUARES
+from .transposition import NO_MOVE
+
+# Piece ranks used by the MVV-LVA (most valuable victim, least valuable
+# attacker) ordering of the captures
+PIECE_RANKS = {Pawn: 1, Knight: 2, Bishop: 3, Rook: 4, Queen: 5, King: 6}
+
+# Ordering scores of each group of movements. History scores are kept
+# below the killer moves score
+HASH_MOVE_SCORE = 1_000_000
+CAPTURE_SCORE = 100_000
+PROMOTION_SCORE = 90_000
+KILLER_SCORE = 80_000
+HISTORY_LIMIT = 50_000
+
+# Killer movements kept for each ply
+KILLERS_PER_PLY = 2
+
+
+def _is_quiet(game, move):
+    return move & MOVE_KIND_MASK != PROMOTION_MOVE and game.captured_piece(move) is None
+
+
+class MoveOrdering:
+    """Orders the movements of a search node to find cutoffs early
+
+    The order is: the transposition table movement, captures by MVV-LVA,
+    promotions, the killer movements of the ply and the remaining
+    movements by their history score.
+
+    Arguments:
+        max_ply (int): Deepest ply with killer movements
+
+    Attributes:
+        killers (list[list[int]]): Packed quiet movements that caused
+            cutoffs at each ply
+        history (list[list[int]]): Butterfly table, with the cutoff
+            score of the quiet movements indexed by origin and target
+        cutoffs (int): Number of beta cutoffs seen
+        first_move_cutoffs (int): Cutoffs caused by the first movement
+    """
+
+    def __init__(self, max_ply=128):
+        self.max_ply = max_ply
+        self.killers = [[NO_MOVE] * KILLERS_PER_PLY for _ in range(max_ply)]
+        self.history = [[0] * 64 for _ in range(64)]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        """Prepare for a new search
+
+        The killer movements are cleared and the history scores are
+        aged, so older searches weigh less.
+        """
+        for killers in self.killers:
+            killers[:] = [NO_MOVE] * KILLERS_PER_PLY
+        self._age_history()
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def clear(self):
+        """Forget the killer movements and the history scores
+
+        Searches started after clearing do not depend on the earlier
+        ones, which keeps fixed-depth results reproducible.
+        """
+        for killers in self.killers:
+            killers[:] = [NO_MOVE] * KILLERS_PER_PLY
+        for scores in self.history:
+            scores[:] = [0] * 64
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def order(self, game, moves, ply, hash_move=NO_MOVE):
+        """Return the movements sorted from the most to the least promising
+
+        Arguments:
+            game (ChessGame): Game at the position of the node
+            moves (list[int]): Packed movements of the node
+            ply (int): Distance of the node from the root
+            hash_move (int): Encoded movement from the transposition
+                table, or NO_MOVE
+        """
+        killers = self.killers[ply] if ply < self.max_ply else ()
+        return sorted(
+            moves,
+            key=lambda move: self._score(game, move, killers, hash_move),
+            reverse=True,
+        )
+
+    def _score(self, game, move, killers, hash_move):
+        if move == hash_move:
+            return HASH_MOVE_SCORE
+
+        score = 0
+        captured_piece = game.captured_piece(move)
+        if captured_piece is not None:
+            piece = game.state.get(BOARD_SQUARES[move & 63])
+            score += (
+                CAPTURE_SCORE
+                + 10 * PIECE_RANKS[type(captured_piece)]
+                - PIECE_RANKS[type(piece)]
+            )
+        if move & MOVE_KIND_MASK == PROMOTION_MOVE:
+            promotes_to = PROMOTION_CHOICES[move >> 12 & 3]
+            score += PROMOTION_SCORE + PIECE_RANKS[promotes_to]
+        if score:
+            return score
+
+        if move in killers:
+            return KILLER_SCORE - killers.index(move)
+
+        origin, target = move & 63, (move >> 6) & 63
+        return self.history[origin][target]
+
+    def record_cutoff(self, game, move, ply, depth, index):
+        """Update the heuristics after a movement caused a beta cutoff
+
+        Arguments:
+            game (ChessGame): Game at the position of the node
+            move (int): Packed movement that caused the cutoff
+            ply (int): Distance of the node from the root
+            depth (int): Remaining depth of the node
+            index (int): Position of the movement in the ordered list
+        """
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        if not _is_quiet(game, move):
+            return
+
+        if ply < self.max_ply:
+            killers = self.killers[ply]
+            if move not in killers:
+                killers.insert(0, move)
+                killers.pop()
+
+        origin, target = move & 63, (move >> 6) & 63
+        self.history[origin][target] += depth * depth
+        if self.history[origin][target] > HISTORY_LIMIT:
+            self._age_history()
+
+    def _age_history(self):
+        for row in self.history:
+            row[:] = [score // 2 for score in row]
+
+    @property
+    def first_move_cutoff_rate(self):
+        """Fraction of the cutoffs caused by the first movement"""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def stats(self):
+        """Return a dict with the cutoff statistics"""
+        return {
+            "cutoffs": self.cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate,
+        }
@@ -0,0 +1,143 @@
+"""Parallel search, splitting the root movements across processes
+
+The best root movement of a shallower search is searched first, alone
+and with a full window. The other movements are then searched in
+parallel with a null window around its score, which only tells whether
+they are better, and the ones that are (fail high) are searched again
+with a window above that score.
+
+Each search starts with a new or cleared transposition table and move
+ordering, so its result only depends on the position, the depth and the
+window. Ties go to the first movement in order, so fixed-depth results
+do not depend on the number of workers or on their scheduling. Workers
+repeat the work that a single search shares through its table, so the
+serial engine is faster unless several cores are available.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from itertools import repeat
+
+from .engine import Engine, SearchResult, MATE_SCORE, decode_line
+from .game import ChessGame
+from .moves import encode_move
+from .transposition import TranspositionTable
+
+# Memory budget of the transposition table of each worker, in megabytes
+WORKER_TABLE_MB = 4
+
+# Game and engine reused by all the searches of a worker process
+_worker_game = None
+_worker_engine = None
+
+
+def _init_worker():
+    global _worker_game, _worker_engine
+    _worker_game = ChessGame()
+    _worker_engine = Engine(_worker_game, table=TranspositionTable(WORKER_TABLE_MB))
+
+
+def _search_root_move(snapshot, move, depth, alpha=-MATE_SCORE, beta=MATE_SCORE):
+    """Search one root movement with the engine of the worker process"""
+    if _worker_game is None:
+        _init_worker()
+
+    _worker_game.restore(snapshot)
+    # Nothing is kept from the movements searched before by this worker
+    _worker_engine.table.clear()
+    _worker_engine.ordering.clear()
+    score, variation = _worker_engine.search_move(move, depth, alpha, beta)
+    return score, variation, _worker_engine.nodes
+
+
+def start_workers(workers=None):
+    """Return a pool of worker processes to pass to 'parallel_search'
+
+    Arguments:
+        workers (Optional[int]): Number of worker processes. Defaults to
+            the number of CPUs
+    """
+    return ProcessPoolExecutor(workers, initializer=_init_worker)
+
+
+def parallel_search(game, depth, workers=None, executor=None):
+    """Search the best movement of the current player at a fixed depth
+
+    Arguments:
+        game (ChessGame): Game to search. It is not changed
+        depth (int): Depth of the search, in plies
+        workers (Optional[int]): Number of worker processes. Defaults to
+            the number of CPUs. With 1 worker the movements are searched
+            in the current process
+        executor (Optional[ProcessPoolExecutor]): Pool to run the
+            searches on, instead of starting one for this search
+
+    Return:
+        A SearchResult
+    """
+    start = time.perf_counter()
+    result = SearchResult()
+    moves = game.legal_move_codes()
+    if not moves:
+        result.score = -MATE_SCORE if game.in_check() else 0
+        return result
+
+    if executor is None and workers != 1:
+        with start_workers(workers) as executor:
+            return parallel_search(game, depth, executor=executor)
+
+    # The history is not needed by the search, and holds the game
+    snapshot = replace(game.snapshot(), history=())
+
+    def search_all(moves, alpha, beta):
+        arguments = (
+            repeat(snapshot),
+            moves,
+            repeat(depth),
+            repeat(alpha),
+            repeat(beta),
+        )
+        if executor is not None:
+            return list(executor.map(_search_root_move, *arguments))
+        return list(map(_search_root_move, *arguments))
+
+    # A shallower search picks the first movement, so the others rarely
+    # beat it, and fills the table to search that movement. The engine is
+    # new, so the order and the score are always the same
+    engine = Engine(game, depth - 1, table=TranspositionTable(WORKER_TABLE_MB))
+    nodes = 0
+    if depth > 1:
+        best_move = encode_move(engine.search().move)
+        nodes += engine.nodes
+        moves.remove(best_move)
+        moves.insert(0, best_move)
+
+    first_move, *other_moves = moves
+    score, variation = engine.search_move(first_move, depth)
+    nodes += engine.nodes
+
+    # Null window searches only tell whether a movement beats the first
+    scores = search_all(other_moves, score, score + 1)
+    nodes += sum(move_nodes for _, _, move_nodes in scores)
+    better = [
+        move
+        for move, (move_score, _, _) in zip(other_moves, scores)
+        if move_score > score
+    ]
+
+    if better:
+        rescores = search_all(better, score, MATE_SCORE)
+        nodes += sum(move_nodes for _, _, move_nodes in rescores)
+        # The first of the best movements, so ties are broken the same way
+        for move_score, move_variation, _ in rescores:
+            if move_score > score:
+                score, variation = move_score, move_variation
+
+    result.principal_variation = decode_line(game, variation)
+    result.move = result.principal_variation[0]
+    result.score = score
+    result.depth = depth
+    result.nodes = nodes
+    result.elapsed = time.perf_counter() - start
+    return result
@@ -0,0 +1,415 @@
+"""Streaming PGN reader and writer
+
+Games are read one at a time from any iterable of lines (or from a file,
+optionally memory-mapped), so the memory use does not depend on the
+size of the file. Run as 'python3 -m game.pgn FILE' to replay the games
+of a file and report the throughput.
+"""
+
+import mmap
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+
+from .fen import STARTING_FEN, PIECE_CLASSES, FILES, parse_square
+from .game import ChessGame, HOME_ROW
+from .moves import Castling, Promotion
+from .pieces import King, Pawn, Color, position_name
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+# Order of the Seven Tag Roster, written before any other header
+ROSTER = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+ROSTER_DEFAULTS = {"Date": "????.??.??"}
+
+HEADER_PATTERN = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+TOKEN_PATTERN = re.compile(r"[{}();]|[^\s{}();]+")
+MOVE_NUMBER_PATTERN = re.compile(r"^\d+\.+")
+SAN_PATTERN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?$")
+CASTLING_SAN = {"O-O": 6, "0-0": 6, "O-O-O": 2, "0-0-0": 2}
+
+
+class PgnError(ValueError):
+    """Raised when a game has an invalid or illegal movement
+
+    Attributes:
+        ply (int | None): Index of the offending movement, starting at 0
+    """
+
+    def __init__(self, message, ply=None):
+        super().__init__(message if ply is None else f"{message} (ply {ply})")
+        self.ply = ply
+
+
+@dataclass
+class PgnGame:
+    """Game read from a PGN file
+
+    Attributes:
+        headers (dict[str, str]): Tag pairs of the game
+        moves (list[str]): Movements in Standard Algebraic Notation
+        result (str): Game termination marker ("1-0", "0-1", "1/2-1/2"
+            or "*")
+    """
+
+    headers: dict = field(default_factory=dict)
+    moves: list = field(default_factory=list)
+    result: str = "*"
+
+
+def read_games(lines):
+    """Yield the games of an iterable of PGN lines
+
+    Comments, variations and numeric annotations are skipped.
+
+    Arguments:
+        lines (Iterable[str]): Lines of the PGN text
+    """
+    current = PgnGame()
+    in_comment = False
+    variation_depth = 0
+
+    for line in lines:
+        if not in_comment and variation_depth == 0:
+            if line.startswith("%"):
+                continue
+
+            header = HEADER_PATTERN.match(line)
+            if header is not None:
+                if current.moves:
+                    # Movements without a result, a new game has started
+                    yield current
+                    current = PgnGame()
+                name, value = header.groups()
+                current.headers[name] = re.sub(r"\\(.)", r"\1", value)
+                continue
+
+        for token in TOKEN_PATTERN.findall(line):
+            if in_comment:
+                in_comment = token != "}"
+            elif token == "{":
+                in_comment = True
+            elif token == ";":
+                break
+            elif token == "(":
+                variation_depth += 1
+            elif token == ")":
+                variation_depth = max(variation_depth - 1, 0)
+            elif variation_depth > 0 or token.startswith("$"):
+                continue
+            elif token in RESULTS:
+                current.result = token
+                yield current
+                current = PgnGame()
+            else:
+                san = MOVE_NUMBER_PATTERN.sub("", token)
+                if san:
+                    current.moves.append(san)
+
+    if current.moves or current.headers:
+        current.result = current.headers.get("Result", current.result)
+        yield current
+
+
+def open_games(path, use_mmap=False):
+    """Yield the games of a PGN file
+
+    Arguments:
+        path (str): Path of the file
+        use_mmap (bool): Read the file through a memory map, so several
+            processes reading the same file share the page cache
+    """
+    with open(path, "rb") as file:
+        if not use_mmap or os.fstat(file.fileno()).st_size == 0:
+            yield from read_games(line.decode("utf-8", "replace") for line in file)
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            lines = iter(mapped.readline, b"")
+            yield from read_games(line.decode("utf-8", "replace") for line in lines)
+
+
+def parse_san(game, san):
+    """Return the Movement of the current player described by a SAN
+
+    Candidate movements are built with 'process_move' from the pieces
+    that match the SAN, so only those are validated. Captures must be
+    marked with 'x', and pawns only capture from the file given.
+
+    Arguments:
+        game (ChessGame): Game in the position before the movement
+        san (str): Movement in Standard Algebraic Notation
+
+    Raises:
+        PgnError: If the SAN is invalid, illegal or ambiguous
+    """
+    san = san.rstrip("+#!?")
+
+    if san in CASTLING_SAN:
+        row = HOME_ROW[game.player]
+        king = game[row, 4]
+        candidates = []
+        if isinstance(king, King) and king.color == game.player:
+            move = game.process_move((row, 4), (row, CASTLING_SAN[san]))
+            if isinstance(move, Castling):
+                candidates.append(move)
+    else:
+        match = SAN_PATTERN.match(san)
+        if match is None:
+            raise PgnError(f"Invalid SAN {san!r}")
+
+        piece_letter, file, rank, capture, target, promotion = match.groups()
+        piece_class = PIECE_CLASSES[(piece_letter or "p").lower()]
+        target = parse_square(target)
+        origin_col = None if file is None else FILES.index(file)
+        # Pawn pushes name no file, and stay on the file of the target
+        if piece_class is Pawn and origin_col is None:
+            origin_col = target[1]
+        origin_row = None if rank is None else 8 - int(rank)
+
+        candidates = []
+        for origin, piece in list(game.state.items()):
+            if (
+                piece is None
+                or piece.color != game.player
+                or type(piece) is not piece_class
+                or origin_col not in (None, origin[1])
+                or origin_row not in (None, origin[0])
+            ):
+                continue
+
+            move = game.process_move(origin, target)
+            if (move.captured_piece is not None) != (capture is not None):
+                continue
+            if isinstance(move, Promotion):
+                if promotion is None:
+                    continue
+                move.promotes_to = PIECE_CLASSES[promotion.lower()]
+            elif promotion is not None:
+                continue
+            candidates.append(move)
+
+    valid = [move for move in candidates if move.is_valid()]
+    if len(valid) > 1:
+        valid = [move for move in valid if game.leaves_king_safe(move)]
+
+    if not valid:
+        raise PgnError(f"Illegal movement {san!r}")
+    if len(valid) > 1:
+        raise PgnError(f"Ambiguous movement {san!r}")
+    return valid[0]
+
+
+def move_to_san(game, move):
+    """Return the Standard Algebraic Notation of a legal movement
+
+    Arguments:
+        game (ChessGame): Game in the position before the movement
+        move (Movement): Legal movement of the current player
+    """
+    if isinstance(move, Castling):
+        san = "O-O" if move.target[1] > move.origin[1] else "O-O-O"
+    elif isinstance(move.piece, Pawn):
+        san = position_name(move.target)
+        if move.captured_piece is not None:
+            san = f"{FILES[move.origin[1]]}x{san}"
+        if isinstance(move, Promotion):
+            san += "=" + move.promotes_to.notation.upper()
+    else:
+        san = move.piece.notation.upper() + _disambiguation(game, move)
+        if move.captured_piece is not None:
+            san += "x"
+        san += position_name(move.target)
+
+    game_over, winner, termination = game.game_over, game.winner, game.termination
+    game.apply_move(move)
+    if game.in_check():
+        san += "#" if game.verify_checkmate(game.player) else "+"
+    game.undo_move()
+    game.game_over, game.winner, game.termination = game_over, winner, termination
+
+    return san
+
+
+def _disambiguation(game, move):
+    """Origin file and/or rank needed to tell a movement from the others"""
+    others = []
+    for origin, piece in game.state.items():
+        # Pieces of the same kind and color are the same shared instance
+        if piece is not move.piece or origin == move.origin:
+            continue
+
+        other = game.process_move(origin, move.target)
+        if other.is_valid() and game.leaves_king_safe(other):
+            others.append(origin)
+
+    if not others:
+        return ""
+
+    row, col = move.origin
+    if all(origin[1] != col for origin in others):
+        return FILES[col]
+    if all(origin[0] != row for origin in others):
+        return str(8 - row)
+    return position_name(move.origin)
+
+
+def replay(pgn_game, game=None):
+    """Play the movements of a PGN game
+
+    Arguments:
+        pgn_game (PgnGame): Game to replay
+        game (Optional[ChessGame]): Game to play the movements on. It is
+            reset to the initial position of the PGN game. Defaults to a
+            new ChessGame that does not claim draws, as recorded games
+            often continue after a draw could be claimed
+
+    Return:
+        The ChessGame at the final position
+
+    Raises:
+        PgnError: If the FEN header or a movement is invalid or illegal
+    """
+    if game is None:
+        game = ChessGame(claim_draws=False)
+
+    fen = pgn_game.headers.get("FEN")
+    if fen is not None:
+        try:
+            game.load_fen(fen)
+        except ValueError as error:
+            # The game is left at the initial position, with no movements
+            game.new_game()
+            raise PgnError(str(error))
+    else:
+        game.new_game()
+
+    for ply, san in enumerate(pgn_game.moves):
+        try:
+            move = parse_san(game, san)
+        except PgnError as error:
+            raise PgnError(str(error), ply)
+
+        if not game.make_move(move):
+            raise PgnError(f"Illegal movement {san!r}", ply)
+    return game
+
+
+def game_result(game):
+    """Return the PGN result marker of the current state of a game"""
+    if game.winner is not None:
+        return "1-0" if game.winner == Color.WHITE else "0-1"
+    if game.game_over:
+        return "1/2-1/2"
+    return "*"
+
+
+def format_game(game, headers=None):
+    """Return the PGN text of a game, with the SAN of its history
+
+    The game is rewound to its initial position to build the SAN of
+    each movement, and is left as it was found.
+
+    Arguments:
+        game (ChessGame): Game to export
+        headers (Optional[dict[str, str]]): Tag pairs of the game. The
+            Seven Tag Roster is completed with unknown values
+    """
+    moves = list(game.history)
+    game_over, winner, termination = game.game_over, game.winner, game.termination
+
+    for _ in moves:
+        game.undo_move()
+
+    start_fen = game.to_fen()
+    start_player = game.player
+    sans = []
+    for move in moves:
+        sans.append(move_to_san(game, move))
+        game.apply_move(move)
+    game.game_over, game.winner, game.termination = game_over, winner, termination
+
+    result = game_result(game)
+
+    headers = dict(headers or {})
+    headers["Result"] = result
+    if start_fen != STARTING_FEN:
+        headers["SetUp"] = "1"
+        headers["FEN"] = start_fen
+
+    tag_names = list(ROSTER) + [name for name in headers if name not in ROSTER]
+    lines = [
+        f'[{name} "{_escape(headers.get(name, ROSTER_DEFAULTS.get(name, "?")))}"]'
+        for name in tag_names
+    ]
+    lines.append("")
+
+    tokens = []
+    for ply, san in enumerate(sans):
+        number, black = divmod(ply + (start_player == Color.BLACK), 2)
+        number += game.initial_fullmove_number
+        if not black:
+            tokens.append(f"{number}.")
+        elif ply == 0:
+            tokens.append(f"{number}...")
+        tokens.append(san)
+    tokens.append(result)
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + len(token) + 1 > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def write_game(file, game, headers=None):
+    """Write the PGN text of a game to a text file
+
+    Arguments:
+        file (TextIO): File to write to
+        game (ChessGame): Game to export
+        headers (Optional[dict[str, str]]): Tag pairs of the game
+    """
+    file.write(format_game(game, headers))
+    file.write("\n")
+
+
+def main(paths, use_mmap=False):
+    """Replay the games of PGN files, reporting the throughput"""
+    game = ChessGame(claim_draws=False)
+    games = plies = errors = 0
+    start = time.perf_counter()
+
+    for path in paths:
+        for pgn_game in open_games(path, use_mmap):
+            games += 1
+            try:
+                replay(pgn_game, game)
+            except PgnError as error:
+                errors += 1
+                print(f"{path}: game {games}: {error}", file=sys.stderr)
+            plies += len(game.history)
+
+    elapsed = time.perf_counter() - start
+    games_per_second = games / elapsed if elapsed else 0
+    print(
+        f"{games} games ({errors} with errors), {plies} plies in {elapsed:.2f}s: "
+        f"{games_per_second:.1f} games/s"
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    use_mmap = "--mmap" in arguments
+    sys.exit(main([path for path in arguments if path != "--mmap"], use_mmap))
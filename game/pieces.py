@@ -1,33 +1,179 @@
-from abc import ABC, abstractmethod
+from abc import ABC
 import enum
 from typing import TypeAlias
 
 Position: TypeAlias = tuple[int, int]
 
 
+def position_name(position: Position) -> str:
+    """Return the algebraic name of a position (e.g. (6, 4) is 'e2')"""
+    row, col = position
+    return f"{'abcdefgh'[col]}{8 - row}"
+
+
 class Color(enum.Enum):
     WHITE = -1
     BLACK = 1
 
 
+# Offsets, as (row, col) steps, used to generate the moves of each piece
+STRAIGHT_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+DIAGONAL_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+KING_OFFSETS = STRAIGHT_DIRECTIONS + DIAGONAL_DIRECTIONS
+KNIGHT_OFFSETS = (
+    (-2, -1),
+    (-2, 1),
+    (-1, -2),
+    (-1, 2),
+    (1, -2),
+    (1, 2),
+    (2, -1),
+    (2, 1),
+)
+
+
+def on_board(position: Position) -> bool:
+    """Return whether the position is inside the 8x8 board"""
+    return 0 <= position[0] < 8 and 0 <= position[1] < 8
+
+
+# Row where the pawns of each color start, and can advance two squares
+PAWN_START_ROWS = {Color.WHITE: 6, Color.BLACK: 1}
+
+BOARD_SQUARES = tuple((row, col) for row in range(8) for col in range(8))
+
+
+def _build_paths(directions, sliding):
+    """Build the table of squares crossed by a piece between two squares
+
+    Arguments:
+        directions (tuple): (row, col) steps the piece moves along
+        sliding (bool): Whether the piece keeps moving along its
+                        directions
+
+    Return:
+        A dict indexed by [origin][target], with the tuple of the
+        squares strictly between both positions. Unreachable targets
+        are missing
+    """
+    paths = {}
+    for origin in BOARD_SQUARES:
+        paths[origin] = {}
+        for row_step, col_step in directions:
+            between = ()
+            target = (origin[0] + row_step, origin[1] + col_step)
+            while on_board(target):
+                paths[origin][target] = between
+                if not sliding:
+                    break
+                between += (target,)
+                target = (target[0] + row_step, target[1] + col_step)
+    return paths
+
+
+def _build_trajectories(paths):
+    """Build the trajectories, with origin and target, of a paths table"""
+    return {
+        origin: {
+            target: frozenset((origin, target) + between)
+            for target, between in targets.items()
+        }
+        for origin, targets in paths.items()
+    }
+
+
+def _build_pawn_paths(color, capture):
+    forward = color.value
+    paths = {origin: {} for origin in BOARD_SQUARES}
+    for row, col in BOARD_SQUARES:
+        if not 0 <= row + forward < 8:
+            continue
+
+        if capture:
+            for target_col in (col - 1, col + 1):
+                if 0 <= target_col < 8:
+                    paths[row, col][row + forward, target_col] = ()
+        else:
+            paths[row, col][row + forward, col] = ()
+            if row == PAWN_START_ROWS[color]:
+                paths[row, col][row + 2 * forward, col] = ((row + forward, col),)
+    return paths
+
+
+# Pawn paths, indexed by [color][origin][target]
+PAWN_PUSH_PATHS = {color: _build_pawn_paths(color, False) for color in Color}
+PAWN_CAPTURE_PATHS = {color: _build_pawn_paths(color, True) for color in Color}
+PAWN_PUSH_TRAJECTORIES = {
+    color: _build_trajectories(paths) for color, paths in PAWN_PUSH_PATHS.items()
+}
+PAWN_CAPTURE_TRAJECTORIES = {
+    color: _build_trajectories(paths) for color, paths in PAWN_CAPTURE_PATHS.items()
+}
+
+# Returned by 'trajectory' when the target can not be reached
+NO_TRAJECTORY = frozenset()
+
+# Shared instances of the pieces, indexed by (piece class, color)
+_FLYWEIGHTS = {}
+
+
 class Piece(ABC):
     """Abstract class to represent a piece
 
-    Subclasses must implement the method 'trajectory'
+    The squares generated by 'attacks' and 'targets' come from the
+    class attributes 'directions' and 'sliding', and subclasses with
+    special moves can extend them. The 'paths' and 'trajectories'
+    tables are precomputed from the same attributes when a subclass is
+    defined, so 'between' and 'trajectory' are lookups.
+
+    Pieces are flyweights: creating a piece returns the single instance
+    of its class and color, so pieces hold no game state. Whether kings
+    and rooks can castle is kept in the castling rights of the game.
 
     Attributes:
         color (Color): Color of the piece
+        code (int): Small integer identifying the class and color of the
+                    piece, from 0 to 11 ('kind * 2', plus 1 if black)
         name (str): Name of the piece. Used to find the piece assets
-        has_moved (bool): Indicate whether the piece have already moved
-                          in the current game. Default is False
         notation (str): Text notation of the piece. In general, it is
                         only one letter
+        kind (int): Index of the piece class in PIECE_TYPES
+        directions (tuple): (row, col) steps the piece can move along
+        sliding (bool): Whether the piece keeps moving along its
+                        directions until it finds a blocker
+        paths (dict): Squares strictly between an origin and each
+                      reachable target, indexed by [origin][target]
+        trajectories (dict): Squares of the trajectory from an origin to
+                             each reachable target, including both
     """
 
-    def __init__(self, color: Color, name: str, has_moved: bool = False):
-        self.color = color
-        self.name = name
-        self.has_moved = has_moved
+    __slots__ = ("color", "code")
+
+    name: str = ""
+    notation: str = ""
+    kind: int = -1
+    directions: tuple = ()
+    sliding: bool = False
+    paths: dict = {}
+    trajectories: dict = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.paths = _build_paths(cls.directions, cls.sliding)
+        cls.trajectories = _build_trajectories(cls.paths)
+
+    def __new__(cls, color: Color):
+        piece = _FLYWEIGHTS.get((cls, color))
+        if piece is None:
+            piece = super().__new__(cls)
+            piece.color = color
+            piece.code = cls.kind * 2 + (color == Color.BLACK)
+            _FLYWEIGHTS[cls, color] = piece
+        return piece
+
+    def __reduce__(self):
+        # Unpickling returns the shared instance of the current process
+        return type(self), (self.color,)
 
     def __str__(self):
         return f"{self.color} {self.name}"
@@ -36,165 +182,183 @@ class Piece(ABC):
         """Return the path to the image associated with this piece"""
         return f"assets/images/{self.color.name.lower()}/{self.name}.png"
 
-    @abstractmethod
     def trajectory(
         self, from_position: Position, to_position: Position, capture: bool = False
-    ) -> set:
+    ) -> frozenset:
         """Find the trajectory between 'from_position' and 'to_position',
         according to the piece movement restrictions and rules.
 
-        This is an abstract method and must be overwritten by all
-        subclasses.
-
         Arguments:
             from_position (tuple[int, int]): Initial position
             to_position (tuple[int, int]): Target position
             capture (bool): Indicate if the move is a capture or not.
                             Default to False
+
+        Return:
+            The squares of the trajectory, including both positions, or
+            an empty set if the piece can not reach the target
         """
-        raise NotImplementedError
+        return self.trajectories[from_position].get(to_position, NO_TRAJECTORY)
+
+    def between(
+        self, from_position: Position, to_position: Position, capture: bool = False
+    ) -> tuple | None:
+        """Return the squares that must be empty for the piece to move
+        from 'from_position' to 'to_position'
 
+        Arguments:
+            from_position (tuple[int, int]): Initial position
+            to_position (tuple[int, int]): Target position
+            capture (bool): Indicate if the move is a capture or not.
+                            Default to False
 
-def diagonal_trajectory(origin: Position, target: Position) -> set:
-    """Return the set of the squares visited when moving between origin
-    and target with a diagonal movement. If no trajectory exists,
-    return an empty set"""
+        Return:
+            A tuple with the squares strictly between both positions, or
+            None if the piece can not reach the target
+        """
+        return self.paths[from_position].get(to_position)
 
-    # A diagonal movement happen when the sum or difference of the
-    # coordinates of the origin and target position are equal
-    from_dif = origin[0] - origin[1]
-    to_dif = target[0] - target[1]
+    def attacks(self, position: Position, board):
+        """Yield the squares attacked by the piece
 
-    from_sum = origin[0] + origin[1]
-    to_sum = target[0] + target[1]
+        Sliding pieces stop at the first occupied square, which is
+        yielded as it can be captured (or is being defended).
 
-    trajectory = set()
+        Arguments:
+            position (tuple[int, int]): Current position of the piece
+            board (ChessGame): Game used to find blockers
+        """
+        row, col = position
+        for row_step, col_step in self.directions:
+            target = (row + row_step, col + col_step)
+            while on_board(target):
+                yield target
+                if not self.sliding or board[target] is not None:
+                    break
+                target = (target[0] + row_step, target[1] + col_step)
+
+    def targets(self, position: Position, board):
+        """Yield the candidate target squares of the piece
+
+        By default, those are the attacked squares. The squares are not
+        validated against the movement rules, so callers must still
+        check the resulting movements.
 
-    if from_dif == to_dif or from_sum == to_sum:
-        row_step = -1 if origin[0] > target[0] else 1
-        col_step = -1 if origin[1] > target[1] else 1
+        Arguments:
+            position (tuple[int, int]): Current position of the piece
+            board (ChessGame): Game used to find blockers
+        """
+        return self.attacks(position, board)
 
-        current_row, current_col = origin
 
-        while (current_row, current_col) != target:
-            trajectory.add((current_row, current_col))
-            current_row += row_step
-            current_col += col_step
-        trajectory.add(target)
+class King(Piece):
+    __slots__ = ()
 
-    return trajectory
+    name = "king"
+    kind = 5
+    notation = "k"
+    directions = KING_OFFSETS
 
+    def targets(self, position, board):
+        yield from self.attacks(position, board)
 
-def straight_trajectory(origin: Position, target: Position) -> set:
-    """Return the set of the squares visited when moving between origin
-    and target with a movement in straight line. If no trajectory exists,
-    return an empty set"""
+        # Castling squares, validated by the Castling movement
+        if board.castling_rights(self.color):
+            row, col = position
+            yield from (
+                (row, target_col)
+                for target_col in (col - 2, col + 2)
+                if 0 <= target_col < 8
+            )
 
-    from_row, from_col = origin
-    to_row, to_col = target
 
-    # Queens can move to any square on the same row or column (like Rooks)
-    if from_row == to_row:
-        if from_col > to_col:
-            from_col, to_col = to_col, from_col
-        return {(from_row, x) for x in range(from_col, to_col + 1)}
+class Queen(Piece):
+    __slots__ = ()
 
-    elif from_col == to_col:
-        if from_row > to_row:
-            from_row, to_row = to_row, from_row
-        return {(x, from_col) for x in range(from_row, to_row + 1)}
-    return set()
+    name = "queen"
+    kind = 4
+    notation = "q"
+    directions = STRAIGHT_DIRECTIONS + DIAGONAL_DIRECTIONS
+    sliding = True
 
 
-class King(Piece):
-    def __init__(self, color, has_moved=False):
-        super().__init__(color, "king", has_moved)
+class Bishop(Piece):
+    __slots__ = ()
 
-    def trajectory(self, from_position, to_position, capture=False):
-        from_row, from_col = from_position
-        to_row, to_col = to_position
+    name = "bishop"
+    kind = 2
+    notation = "b"
+    directions = DIAGONAL_DIRECTIONS
+    sliding = True
 
-        # Kings can move to any adjacent square
-        row_dif = abs(from_row - to_row)
-        col_dif = abs(from_col - to_col)
 
-        if row_dif <= 1 and col_dif <= 1:
-            return {from_position, to_position}
-        else:
-            return set()
+class Knight(Piece):
+    __slots__ = ()
 
+    name = "knight"
+    kind = 1
+    notation = "n"
+    directions = KNIGHT_OFFSETS
 
-class Queen(Piece):
-    def __init__(self, color, has_moved=False):
-        super().__init__(color, "queen", has_moved)
 
-    def trajectory(self, from_position, to_position, capture=False):
-        if trajectory := straight_trajectory(from_position, to_position):
-            return trajectory
+class Rook(Piece):
+    __slots__ = ()
 
-        return diagonal_trajectory(from_position, to_position)
+    name = "rook"
+    kind = 3
+    notation = "r"
+    directions = STRAIGHT_DIRECTIONS
+    sliding = True
 
 
-class Bishop(Piece):
-    def __init__(self, color, has_moved=False):
-        super().__init__(color, "bishop", has_moved)
+class Pawn(Piece):
+    __slots__ = ()
 
-    def trajectory(self, from_position, to_position, capture=False):
-        return diagonal_trajectory(from_position, to_position)
+    name = "pawn"
+    kind = 0
+    notation = "p"
 
+    def attacks(self, position, board):
+        row, col = position
+        forward = row + self.color.value
 
-class Knight(Piece):
-    def __init__(self, color, has_moved=False):
-        super().__init__(color, "knight", has_moved)
+        if 0 <= forward < 8:
+            yield from ((forward, c) for c in (col - 1, col + 1) if 0 <= c < 8)
 
-    def trajectory(self, from_position, to_position, capture=False):
-        from_row, from_col = from_position
-        to_row, to_col = to_position
-
-        # Knights can jump two squares in one direction and 1 square the
-        # other direction, doesn't matter the orientation
-        diff = (abs(to_row - from_row), abs(to_col - from_col))
-        if diff in {(1, 2), (2, 1)}:
-            return {from_position, to_position}
-        else:
-            return set()
+    def targets(self, position, board):
+        row, col = position
+        forward = row + self.color.value
 
+        if not 0 <= forward < 8:
+            return
 
-class Rook(Piece):
-    def __init__(self, color, has_moved=False):
-        super().__init__(color, "rook", has_moved)
+        # Pawns can only advance to empty squares
+        if board[forward, col] is None:
+            yield (forward, col)
 
-    def trajectory(self, from_position, to_position, capture=False):
-        return straight_trajectory(from_position, to_position)
+            double = forward + self.color.value
+            if row == PAWN_START_ROWS[self.color] and board[double, col] is None:
+                yield (double, col)
 
+        # Diagonal squares, either captures or en passant
+        yield from self.attacks(position, board)
 
-class Pawn(Piece):
-    def __init__(self, color, has_moved=False):
-        super().__init__(color, "pawn", has_moved)
+    def between(self, from_position, to_position, capture=False):
+        paths = PAWN_CAPTURE_PATHS if capture else PAWN_PUSH_PATHS
+        return paths[self.color][from_position].get(to_position)
 
     def trajectory(self, from_position, to_position, capture=False):
-        from_row, from_col = from_position
-        to_row, to_col = to_position
-
-        trajectory = set()
-        if not capture:
-            # If not capturing, a pawn can only move to the same column
-            if from_col == to_col:
-                limit = 2 if not self.has_moved else 1
-
-                if abs(to_row - from_row) <= limit:
-                    if self.color == Color.WHITE:
-                        trajectory = {
-                            (x, from_col) for x in range(to_row, from_row + 1)
-                        }
-                    else:
-                        trajectory = {
-                            (x, from_col) for x in range(from_row, to_row + 1)
-                        }
+        if capture:
+            trajectories = PAWN_CAPTURE_TRAJECTORIES[self.color]
         else:
-            # If capturing, it can move forward one square and one
-            # column to the side
-            if to_row - from_row == self.color.value and abs(from_col - to_col) == 1:
-                trajectory = {from_position, to_position}
+            trajectories = PAWN_PUSH_TRAJECTORIES[self.color]
+        return trajectories[from_position].get(to_position, NO_TRAJECTORY)
+
+
+# Piece classes, in the order of their 'kind'
+PIECE_TYPES = (Pawn, Knight, Bishop, Rook, Queen, King)
+
 
-        return trajectory
+def piece_from_code(code: int) -> Piece:
+    """Return the piece identified by a piece code"""
+    return PIECE_TYPES[code >> 1](Color.BLACK if code & 1 else Color.WHITE)
@@ -0,0 +1,299 @@
+"""Headless game server
+
+Keeps many games in memory and plays them over a line protocol, so any
+number of clients can share one process. Engine searches run in a pool
+of worker processes, so the event loop keeps serving the other games
+while the engine thinks. Run with 'python3 serve.py'.
+
+Every command is a line, answered by a single line:
+
+    new [FEN]                       Start a game
+    move ID ORIGIN TARGET [PIECE]   Play a movement, like 'move 1 e2 e4'
+                                    or 'move 1 e7 e8 n'. Promotions
+                                    default to a queen
+    engine ID                       Let the engine play the current player
+    state ID                        Current state of a game
+    close ID                        Forget a game
+    stats                           Memory and latency report
+
+Game commands are answered with 'ok ID MOVE RESULT FEN', where MOVE is
+the last movement played ('-' if none) and RESULT is the PGN result
+marker. The 'stats' command is answered with 'ok NAME=VALUE ...', and
+failures with 'error MESSAGE'.
+"""
+
+import asyncio
+import enum
+import inspect
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from .engine import Engine
+from .fen import STARTING_FEN, PIECE_CLASSES, parse_square
+from .game import ChessGame
+from .moves import Promotion, PROMOTION_CHOICES, encode_move
+from .pieces import Piece
+from .pgn import game_result
+from .transposition import TranspositionTable
+
+# Latencies kept to compute the percentiles, per command
+LATENCY_SAMPLES = 10_000
+PERCENTILES = (50, 90, 99)
+# Games measured to estimate the memory footprint of a game
+FOOTPRINT_SAMPLES = 32
+
+
+class CommandError(ValueError):
+    """Raised when a command can not be executed"""
+
+
+@dataclass
+class GameSession:
+    """Game hosted by the server
+
+    Attributes:
+        game (ChessGame): Game being played
+        start_fen (str): Initial position of the game
+        lock (asyncio.Lock): Held while a command uses the game, so the
+            movements of a game are played one at a time
+    """
+
+    game: ChessGame
+    start_fen: str
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of a sorted list of values"""
+    if not values:
+        return 0.0
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[index]
+
+
+def deep_size(obj, seen=None):
+    """Estimate the memory used by an object and everything it refers to
+
+    Classes, functions, enum members and the shared pieces are not
+    counted, as they are not owned by any single object.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, (type, enum.Enum, Piece)) or callable(obj):
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(
+            deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items()
+        )
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen)
+    return size
+
+
+# Engine state reused by all the searches of a worker process
+_worker_table = None
+
+
+def _init_worker():
+    global _worker_table
+    _worker_table = TranspositionTable()
+
+
+def _search_move(start_fen, moves, max_depth, time_limit):
+    """Search the best movement of a game in a worker process
+
+    Arguments:
+        start_fen (str): Initial position of the game
+        moves (list[int]): Packed movements played since then, so
+            repetitions are known to the search
+        max_depth (int): Maximum depth of the search
+        time_limit (float): Search time budget, in seconds
+
+    Return:
+        The packed best movement, or None if there are no movements
+    """
+    if _worker_table is None:
+        _init_worker()
+
+    game = ChessGame.from_fen(start_fen)
+    for move in moves:
+        game.push(move)
+
+    result = Engine(game, max_depth, time_limit, table=_worker_table).search()
+    return None if result.move is None else encode_move(result.move)
+
+
+class GameServer:
+    """Hosts games and answers the commands of the line protocol
+
+    Arguments:
+        workers (Optional[int]): Engine worker processes. Defaults to
+            the number of CPUs
+        engine_depth (int): Maximum depth of the engine searches
+        engine_time (float): Time budget of the engine searches, in
+            seconds
+    """
+
+    def __init__(self, workers=None, engine_depth=6, engine_time=1.0):
+        self.workers = workers
+        self.engine_depth = engine_depth
+        self.engine_time = engine_time
+        self.sessions = {}
+        self.latencies = {
+            command: deque(maxlen=LATENCY_SAMPLES) for command in ("move", "engine")
+        }
+        self._next_id = 1
+        self._executor = None
+
+    def start(self):
+        self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        """Serve clients until the task is cancelled"""
+        self.start()
+        try:
+            server = await asyncio.start_server(self.handle_client, host, port)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    async def handle_client(self, reader, writer):
+        """Answer the commands of a client until it disconnects"""
+        try:
+            while line := await reader.readline():
+                try:
+                    answer = await self.execute(line.decode())
+                except Exception as error:
+                    # Bugs fail the command, not the whole connection
+                    answer = f"error Internal error ({type(error).__name__}: {error})"
+                writer.write((answer + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def execute(self, line):
+        """Execute a command line and return the answer line"""
+        command, *arguments = line.split() or [""]
+        handler = getattr(self, f"command_{command}", None)
+        if handler is None:
+            return f"error Unknown command {command!r}"
+
+        try:
+            inspect.signature(handler).bind(*arguments)
+        except TypeError:
+            return f"error Wrong arguments for {command!r}"
+
+        try:
+            return "ok " + await handler(*arguments)
+        except ValueError as error:
+            return f"error {error}"
+
+    def _session(self, game_id):
+        try:
+            return self.sessions[int(game_id)]
+        except (KeyError, ValueError):
+            raise CommandError(f"Unknown game {game_id!r}")
+
+    def _state(self, game_id, game):
+        last_move = str(game.last_move) if game.last_move is not None else "-"
+        return f"{game_id} {last_move} {game_result(game)} {game.to_fen()}"
+
+    async def command_new(self, *fen):
+        start_fen = " ".join(fen) or STARTING_FEN
+        game = ChessGame.from_fen(start_fen)
+
+        game_id = self._next_id
+        self._next_id += 1
+        self.sessions[game_id] = GameSession(game, start_fen)
+        return self._state(game_id, game)
+
+    async def command_move(self, game_id, origin, target, piece="q"):
+        session = self._session(game_id)
+        start = time.perf_counter()
+        async with session.lock:
+            game = session.game
+            move = game.process_move(parse_square(origin), parse_square(target))
+            if isinstance(move, Promotion):
+                move.promotes_to = PIECE_CLASSES.get(piece.lower())
+                if move.promotes_to not in PROMOTION_CHOICES:
+                    raise CommandError(f"Invalid promotion {piece!r}")
+
+            if game.game_over:
+                raise CommandError("The game is over")
+            if not game.make_move(move):
+                raise CommandError(f"Illegal movement {origin}{target}")
+
+        self.latencies["move"].append(time.perf_counter() - start)
+        return self._state(game_id, game)
+
+    async def command_engine(self, game_id):
+        session = self._session(game_id)
+        start = time.perf_counter()
+        async with session.lock:
+            game = session.game
+            if game.game_over:
+                raise CommandError("The game is over")
+
+            moves = [encode_move(move) for move in game.history]
+            best_move = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                _search_move,
+                session.start_fen,
+                moves,
+                self.engine_depth,
+                self.engine_time,
+            )
+            if best_move is None:
+                raise CommandError("No legal movements")
+            game.make_move(game.decode_move(best_move))
+
+        self.latencies["engine"].append(time.perf_counter() - start)
+        return self._state(game_id, game)
+
+    async def command_state(self, game_id):
+        return self._state(game_id, self._session(game_id).game)
+
+    async def command_close(self, game_id):
+        session = self._session(game_id)
+        del self.sessions[int(game_id)]
+        return self._state(game_id, session.game)
+
+    async def command_stats(self):
+        return " ".join(f"{name}={value}" for name, value in self.stats().items())
+
+    def stats(self):
+        """Return the memory and latency report of the server
+
+        The memory footprint is the mean size of a sample of the games.
+        Latencies are in milliseconds, over the most recent commands.
+        """
+        sample = list(self.sessions.values())[:FOOTPRINT_SAMPLES]
+        footprint = sum(deep_size(session.game) for session in sample)
+
+        report = {
+            "games": len(self.sessions),
+            "game_bytes": footprint // len(sample) if sample else 0,
+        }
+        for command, latencies in self.latencies.items():
+            values = sorted(latencies)
+            report[f"{command}_count"] = len(values)
+            for percent in PERCENTILES:
+                milliseconds = percentile(values, percent) * 1000
+                report[f"{command}_p{percent}_ms"] = f"{milliseconds:.2f}"
+        return report
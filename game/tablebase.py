@@ -0,0 +1,126 @@
+"""Endgame tablebase probing
+
+Syzygy files are probed through the optional python-chess package
+('pip install chess', listed in requirements.txt), which memory-maps
+each table the first time its material is probed, and keeps a limited
+number of files open. Without tablebase files, only the positions that
+are draws by insufficient material are answered, so no dependency is
+needed.
+
+The results are WDL values from the point of view of the player to
+move: 2 is a win, 1 a win that the fifty-move rule turns into a draw, 0
+a draw, -1 a loss saved by the fifty-move rule and -2 a loss.
+"""
+
+try:
+    import chess
+    import chess.syzygy
+except ImportError:
+    chess = None
+
+WIN = 2
+CURSED_WIN = 1
+DRAW = 0
+BLESSED_LOSS = -1
+LOSS = -2
+
+
+def piece_count(game):
+    """Return the number of pieces on the board, kings included"""
+    if game.bitboards is not None:
+        return game.bitboards.occupied.bit_count()
+    return sum(piece is not None for _, piece in game.state.items())
+
+
+class Tablebase:
+    """Endgame tablebase, backed by local Syzygy files
+
+    Arguments:
+        directories (Iterable[str]): Directories with Syzygy '.rtbw'
+            and '.rtbz' files. With no directories, only the local
+            fallback is used
+        max_open_files (int): Maximum number of table files kept open
+            at once. The least recently used ones are closed first
+
+    Raises:
+        ImportError: If directories are given without python-chess
+    """
+
+    def __init__(self, directories=(), max_open_files=64):
+        self.directories = list(directories)
+        self.max_pieces = 0
+        self._tables = None
+
+        if not self.directories:
+            return
+        if chess is None:
+            raise ImportError("python-chess is needed to probe Syzygy files")
+
+        self._tables = chess.syzygy.Tablebase(max_fds=max_open_files)
+        for directory in self.directories:
+            self._tables.add_directory(directory)
+
+        # Tables are named after their material, like 'KRPvKR'
+        self.max_pieces = max((len(name) - 1 for name in self._tables.wdl), default=0)
+
+    def close(self):
+        if self._tables is not None:
+            self._tables.close()
+            self._tables = None
+            self.max_pieces = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def covers(self, game):
+        """Check if the tables may have the current position
+
+        Positions with castling rights are never in the tables.
+        """
+        return (
+            self.max_pieces > 0
+            and not game.castling_rights()
+            and piece_count(game) <= self.max_pieces
+        )
+
+    def _board(self, game):
+        return chess.Board(game.to_fen())
+
+    def probe_wdl(self, game):
+        """Return the WDL value of the current position
+
+        Arguments:
+            game (ChessGame): Game to probe
+
+        Return:
+            The WDL value for the player to move, or None if the
+            position is not in the tables
+        """
+        if game.is_insufficient_material():
+            return DRAW
+        if not self.covers(game):
+            return None
+        return self._tables.get_wdl(self._board(game))
+
+    def probe_dtz(self, game):
+        """Return the distance to zeroing of the current position
+
+        The distance is the number of plies to the next capture or pawn
+        movement of the optimal play, positive when the player to move
+        wins and negative when it loses.
+
+        Arguments:
+            game (ChessGame): Game to probe
+
+        Return:
+            The distance, 0 for draws, or None if the position is not in
+            the tables
+        """
+        if game.is_insufficient_material():
+            return 0
+        if not self.covers(game):
+            return None
+        return self._tables.get_dtz(self._board(game))
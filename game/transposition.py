@@ -0,0 +1,124 @@
+from array import array
+
+# Bound types of the stored scores
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Bytes used by each entry: key (8), score (4), move (2), depth (1) and
+# bound (1)
+ENTRY_SIZE = 16
+# Entries per bucket: a depth-preferred slot and an always-replace slot
+BUCKET_SIZE = 2
+
+NO_MOVE = 0
+
+
+class TranspositionTable:
+    """Fixed-size table of search results, keyed by position key
+
+    The entries live in preallocated arrays, so the memory use is set
+    once by the size budget and never grows. Each key maps to a bucket
+    with two slots: the first keeps the deepest result seen, the second
+    always takes the newest one.
+
+    Arguments:
+        size_mb (float): Memory budget of the table, in megabytes
+
+    Attributes:
+        probes (int): Number of lookups
+        hits (int): Number of lookups that found the key
+        stores (int): Number of stored results
+    """
+
+    def __init__(self, size_mb=16):
+        entries = max(BUCKET_SIZE, int(size_mb * 1024 * 1024) // ENTRY_SIZE)
+        self.buckets = entries // BUCKET_SIZE
+        entries = self.buckets * BUCKET_SIZE
+
+        self.keys = array("Q", bytes(8 * entries))
+        self.scores = array("i", bytes(4 * entries))
+        self.moves = array("H", bytes(2 * entries))
+        self.bounds = array("B", bytes(entries))
+        # Key 0 could be a real position, so empty slots are flagged
+        # with a negative depth
+        self.depths = array("b", [-1]) * entries
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def __len__(self):
+        return self.buckets * BUCKET_SIZE
+
+    @property
+    def hit_rate(self):
+        """Fraction of the lookups that found the key"""
+        return self.hits / self.probes if self.probes else 0.0
+
+    def probe(self, key):
+        """Look up a position
+
+        Arguments:
+            key (int): Position key
+
+        Return:
+            A tuple (depth, bound, score, move) or None if the position
+            is not stored
+        """
+        self.probes += 1
+        index = (key % self.buckets) * BUCKET_SIZE
+
+        for slot in range(index, index + BUCKET_SIZE):
+            if self.keys[slot] == key and self.depths[slot] >= 0:
+                self.hits += 1
+                return (
+                    self.depths[slot],
+                    self.bounds[slot],
+                    self.scores[slot],
+                    self.moves[slot],
+                )
+        return None
+
+    def store(self, key, depth, bound, score, move=NO_MOVE):
+        """Store the result of a search
+
+        The depth-preferred slot is replaced when the new result is at
+        least as deep as the stored one, or refers to the same position.
+        Otherwise the result goes to the always-replace slot.
+
+        Arguments:
+            key (int): Position key
+            depth (int): Depth of the search, in plies
+            bound (int): EXACT, LOWER or UPPER
+            score (int): Score of the position
+            move (int): Encoded best movement, or NO_MOVE
+        """
+        self.stores += 1
+        slot = (key % self.buckets) * BUCKET_SIZE
+
+        if self.keys[slot] != key and self.depths[slot] > depth:
+            slot += 1
+
+        self.keys[slot] = key
+        self.depths[slot] = min(depth, 127)
+        self.bounds[slot] = bound
+        self.scores[slot] = score
+        self.moves[slot] = move
+
+    def clear(self):
+        """Remove all the entries, keeping the allocated memory"""
+        self.depths[:] = array("b", [-1]) * len(self)
+        self.probes = self.hits = self.stores = 0
+
+    def stats(self):
+        """Return a dict with the usage statistics of the table"""
+        used = sum(1 for depth in self.depths if depth >= 0)
+        return {
+            "entries": len(self),
+            "used": used,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate,
+            "stores": self.stores,
+        }
@@ -0,0 +1,53 @@
+import random
+
+from .pieces import Color, PIECE_TYPES
+
+# The keys are generated from a fixed seed, so the same position has the
+# same key across processes and runs (e.g. for books stored on disk)
+_random = random.Random(0x5EED_C4E55)
+
+PIECE_KEYS = tuple(
+    tuple(_random.getrandbits(64) for _ in range(64))
+    for _ in range(len(PIECE_TYPES) * 2)
+)
+SIDE_KEY = _random.getrandbits(64)
+CASTLING_KEYS = tuple(_random.getrandbits(64) for _ in range(4))
+EN_PASSANT_KEYS = tuple(_random.getrandbits(64) for _ in range(8))
+
+
+def piece_key(piece, position):
+    """Return the key of a piece standing on a position"""
+    return PIECE_KEYS[piece.code][position[0] * 8 + position[1]]
+
+
+def castling_key(rights):
+    """Return the key of a castling rights bitmask"""
+    key = 0
+    for index, right_key in enumerate(CASTLING_KEYS):
+        if rights & (1 << index):
+            key ^= right_key
+    return key
+
+
+def en_passant_key(file):
+    """Return the key of the en passant file, which may be None"""
+    return 0 if file is None else EN_PASSANT_KEYS[file]
+
+
+def compute_key(game):
+    """Compute the key of a position from scratch
+
+    Arguments:
+        game (ChessGame): Game to compute the key for
+    """
+    key = 0
+    for position, piece in game:
+        if piece is not None:
+            key ^= piece_key(piece, position)
+
+    if game.player == Color.BLACK:
+        key ^= SIDE_KEY
+
+    key ^= castling_key(game.castling_rights())
+    key ^= en_passant_key(game.en_passant_file())
+    return key
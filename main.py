@@ -1,8 +1,30 @@
+import argparse
+
 from screens.main import MainUI
 from game import ChessGame
+from game.engine_player import EnginePlayer
+from game.pieces import Color
+
 
+parser = argparse.ArgumentParser(description="Chess game")
+parser.add_argument(
+    "--engine",
+    choices=("white", "black"),
+    help="side played by the engine (default: two human players)",
+)
+parser.add_argument(
+    "--engine-time",
+    type=float,
+    default=2.0,
+    help="engine time per movement, in seconds (default: 2)",
+)
+arguments = parser.parse_args()
 
 game = ChessGame()
-ui = MainUI(game)
+if arguments.engine is not None:
+    engine = EnginePlayer(time_limit=arguments.engine_time)
+    ui = MainUI(game, engine, Color[arguments.engine.upper()])
+else:
+    ui = MainUI(game)
 
 ui.run()
@@ -0,0 +1,168 @@
+"""Validate and benchmark the move generation with perft
+
+Runs a suite of positions with known perft results and reports the
+node counts and the nodes/second of each run. With '--search-depth',
+the positions are searched in parallel instead, reporting the speedup
+of each number of workers over the serial engine.
+
+Usage:
+    python3 perft.py [--depth N] [--divide] [--bitboard] [position ...]
+    python3 perft.py --search-depth N [--workers 1,2,4] [position ...]
+"""
+
+import argparse
+import sys
+import time
+
+from game import ChessGame
+from game.bitboard import BitboardState
+from game.engine import Engine
+from game.fen import STARTING_FEN
+from game.parallel import parallel_search, start_workers
+
+# Positions with their known node counts for depths 1, 2, 3...
+SUITE = {
+    "start": (STARTING_FEN, (20, 400, 8902, 197281)),
+    # Castling (also through and out of check), pins and en passant
+    "kiwipete": (
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        (48, 2039, 97862, 4085603),
+    ),
+    # En passant captures that expose the king to a rook along the row
+    "en-passant": (
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        (14, 191, 2812, 43238, 674624),
+    ),
+    # Promotions, including captures that promote
+    "promotion": (
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        (6, 264, 9467, 422333),
+    ),
+    "promotion-check": (
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        (44, 1486, 62379, 2103487),
+    ),
+}
+
+
+def run(name, depth, state_class, divide=False):
+    """Run perft for one position of the suite and print the results
+
+    Return:
+        Whether the node count matches the expected result
+    """
+    fen, expected = SUITE[name]
+    game = ChessGame.from_fen(fen, state_class=state_class)
+
+    start = time.perf_counter()
+    if divide:
+        results = game.divide(depth)
+        for move, count in results:
+            print(f"  {move}: {count}")
+        nodes = sum(count for _, count in results)
+    else:
+        nodes = game.perft(depth)
+    elapsed = time.perf_counter() - start
+
+    expected_nodes = expected[depth - 1] if depth <= len(expected) else None
+    status = "ok" if expected_nodes in (None, nodes) else f"FAIL ({expected_nodes})"
+    nodes_per_second = nodes / elapsed if elapsed else 0
+
+    print(
+        f"{name:<16} depth {depth}  {nodes:>9} nodes  {elapsed:8.2f}s  "
+        f"{nodes_per_second:>9.0f} nodes/s  {status}"
+    )
+    return expected_nodes in (None, nodes)
+
+
+def run_search(name, depth, worker_counts):
+    """Search one position of the suite serially, then with each number
+    of workers
+
+    Return:
+        Whether all the parallel searches found the same principal
+        variation and score, and the score of the serial search
+    """
+    fen, _ = SUITE[name]
+    game = ChessGame.from_fen(fen)
+
+    serial = Engine(game, max_depth=depth).search()
+    print(
+        f"{name:<16} depth {depth}   serial engine  {serial.elapsed:8.2f}s  "
+        f"{1:5.2f}x  {serial.move} {serial.score:>7}"
+    )
+
+    first = None
+    same = True
+    for workers in worker_counts:
+        if workers == 1:
+            result = parallel_search(game, depth, workers=1)
+        else:
+            # The pool is started before the clock, as it is reused
+            # across searches in practice
+            with start_workers(workers) as executor:
+                list(executor.map(int, range(workers)))
+                result = parallel_search(game, depth, executor=executor)
+
+        # Fixed-depth results must not depend on the number of workers
+        line = [str(move) for move in result.principal_variation]
+        first = first or (line, result.score)
+        same = same and (line, result.score) == first and result.score == serial.score
+        speedup = serial.elapsed / result.elapsed if result.elapsed else 0
+        print(
+            f"{name:<16} depth {depth}  {workers:>3} workers  {result.elapsed:8.2f}s  "
+            f"{speedup:5.2f}x  {result.move} {result.score:>7}  "
+            f"{'ok' if same else 'MISMATCH'}"
+        )
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "positions",
+        nargs="*",
+        help=f"Positions to run, among {', '.join(SUITE)} (default: all)",
+    )
+    parser.add_argument("--depth", type=int, default=2, help="Perft depth")
+    parser.add_argument(
+        "--divide", action="store_true", help="Print the count of each root move"
+    )
+    parser.add_argument(
+        "--bitboard", action="store_true", help="Use the bitboard board storage"
+    )
+    parser.add_argument(
+        "--search-depth",
+        type=int,
+        default=None,
+        help="Benchmark the parallel search at this depth, instead of perft",
+    )
+    parser.add_argument(
+        "--workers",
+        default="1,2,4",
+        help="Comma-separated worker counts of the search benchmark",
+    )
+    args = parser.parse_args()
+
+    unknown = set(args.positions) - set(SUITE)
+    if unknown:
+        parser.error(f"unknown positions: {', '.join(sorted(unknown))}")
+
+    if args.search_depth is not None:
+        worker_counts = [int(count) for count in args.workers.split(",")]
+        passed = [
+            run_search(name, args.search_depth, worker_counts)
+            for name in args.positions or SUITE
+        ]
+        return 0 if all(passed) else 1
+
+    state_class = BitboardState if args.bitboard else dict
+    passed = [
+        run(name, args.depth, state_class, args.divide)
+        for name in args.positions or SUITE
+    ]
+    return 0 if all(passed) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import pygame
+
+from game.pieces import PIECE_TYPES, Color
+
+BACKGROUND_PATH = "assets/images/chessboard.png"
+
+# Images shared by all the screens, loaded on first use, as converting
+# them to the display format needs the display to be set up
+_piece_sprites = None
+_background = None
+
+
+def piece_sprites():
+    """Return the images of the pieces, indexed by 'Piece.code'
+
+    The 12 images are loaded once, into a single atlas surface in the
+    display format, and served as subsurfaces of it.
+    """
+    global _piece_sprites
+    if _piece_sprites is None:
+        pieces = [piece_type(color) for piece_type in PIECE_TYPES for color in Color]
+        pieces.sort(key=lambda piece: piece.code)
+        images = [pygame.image.load(piece.get_image_path()) for piece in pieces]
+
+        width, height = images[0].get_size()
+        atlas = pygame.Surface((width * len(images), height), pygame.SRCALPHA)
+        for index, image in enumerate(images):
+            atlas.blit(image, (index * width, 0))
+        atlas = atlas.convert_alpha()
+
+        _piece_sprites = [
+            atlas.subsurface((index * width, 0, width, height))
+            for index in range(len(images))
+        ]
+    return _piece_sprites
+
+
+def piece_sprite(piece):
+    """Return the image of a piece"""
+    return piece_sprites()[piece.code]
+
+
+def background():
+    """Return the image of the empty board, in the display format"""
+    global _background
+    if _background is None:
+        _background = pygame.image.load(BACKGROUND_PATH).convert()
+    return _background
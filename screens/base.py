@@ -15,6 +15,12 @@ class Screen(ABC):
 
     @abstractmethod
     def draw(self, surface):
+        """Draw the screen on the surface
+
+        Return:
+            The list of rectangles that changed, or None if the whole
+            surface should be updated
+        """
         raise NotImplementedError
 
     @abstractmethod
@@ -2,73 +2,179 @@ import pygame
 from game import pieces
 from game.moves import Promotion
 
+from .assets import piece_sprites, piece_sprite, background
 from .base import ScreenTransition, Screen
 
 PIECE_SPRITE_SIZE = 60
 SQUARE_SIZE = 64
 PIECE_OFFSET = (SQUARE_SIZE - PIECE_SPRITE_SIZE) // 2
+TARGET_HINT_COLOR = (0, 0, 0, 64)
+TARGET_HINT_RADIUS = 10
 
 
 class Board(Screen):
-    background = pygame.image.load("./assets/images/chessboard.png")
+    """Chess board screen
 
-    def __init__(self, game):
+    Arguments:
+        game (ChessGame): Game to show and play
+        engine (Optional[EnginePlayer]): Engine playing one of the sides
+        engine_color (Optional[Color]): Side played by the engine
+    """
+
+    def __init__(self, game, engine=None, engine_color=None):
         super().__init__()
 
         self.board = game
+        self.engine = engine
+        self.engine_color = engine_color
+        # Game version the engine is searching, and last progress shown
+        self.engine_version = None
+        self.engine_progress = None
 
         self.dragging = False
         self.dragging_from = (None, None)
         self.exit = False
 
+        # Promotion waiting for the choice of the piece
+        self.promotion_move = None
+        self.promotion_overlay = None
+
         self.handlers = {
             pygame.MOUSEBUTTONDOWN: self.handle_mouse_down,
             pygame.MOUSEBUTTONUP: self.handle_mouse_up,
             pygame.KEYUP: self.handle_keyboard,
         }
 
-        self.piece_images = {
-            piece.get_image_path(): pygame.image.load(piece.get_image_path())
-            for _, piece in self.board
-            if piece is not None
-        }
+        self.background = background()
+        self.piece_sprites = piece_sprites()
+
+        self.target_hint = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
+        pygame.draw.circle(
+            self.target_hint,
+            TARGET_HINT_COLOR,
+            (SQUARE_SIZE // 2, SQUARE_SIZE // 2),
+            TARGET_HINT_RADIUS,
+        )
+
+        # Board without the dragged piece, and what it was drawn from
+        self.board_surface = pygame.Surface(pygame.display.get_surface().get_size())
+        self.rendered = None
+        self.drag_rect = None
 
     def draw(self, surface):
-        surface.fill((255, 255, 255))
-        surface.blit(self.background, (0, 0))
+        """Draw the board, returning the rectangles that changed
+
+        The background, the pieces, the target hints and the promotion
+        menu are composited once per version of the game, dragged piece
+        and pending promotion. Otherwise, only the squares under the
+        dragged piece are redrawn.
+        """
+        self.update_engine()
+
+        dragging_from = self.dragging_from if self.dragging else None
+        rendered = (self.board.version, dragging_from, self.promotion_overlay)
+
+        if rendered != self.rendered:
+            self.compose_board(dragging_from)
+            self.rendered = rendered
+            surface.blit(self.board_surface, (0, 0))
+            dirty = [self.board_surface.get_rect()]
+        else:
+            # Erase the dragged piece from its last position
+            dirty = [self.drag_rect] if self.drag_rect is not None else []
+            for rect in dirty:
+                surface.blit(self.board_surface, rect, rect)
+        self.drag_rect = None
+
+        piece = self.board[dragging_from] if dragging_from is not None else None
+        if piece is not None:
+            image = self.piece_sprites[piece.code]
+            mouse_x, mouse_y = pygame.mouse.get_pos()
+            self.drag_rect = surface.blit(
+                image,
+                (mouse_x - PIECE_SPRITE_SIZE // 2, mouse_y - PIECE_SPRITE_SIZE // 2),
+            )
+            dirty.append(self.drag_rect)
 
-        for (y, x), piece in self.board:
-            if piece is None:
-                continue
+        return dirty
+
+    def update_engine(self):
+        """Start the engine searches and make the movements they found
 
-            if (y, x) == self.dragging_from:
+        The engine thinks on its turn and ponders on the other one. A
+        new search is started whenever the game changes, so movements
+        of positions that were undone are never made.
+        """
+        if self.engine is None:
+            return
+
+        if self.board.game_over:
+            self.engine.stop()
+            return
+
+        if self.engine_version != self.board.version:
+            if self.board.player == self.engine_color:
+                self.engine.think(self.board)
+            else:
+                self.engine.ponder(self.board)
+            self.engine_version = self.board.version
+
+        move = self.engine.poll()
+        if move is not None:
+            move.play(self.board)
+
+        progress = self.engine.progress
+        if progress is not None and progress != self.engine_progress:
+            self.engine_progress = progress
+            variation = " ".join(progress.principal_variation)
+            action = "pondering" if progress.pondering else "thinking"
+            pygame.display.set_caption(
+                f"Chess Game - {action}: depth {progress.depth}, "
+                f"score {progress.score}, {variation}"
+            )
+
+    def compose_board(self, dragging_from):
+        """Draw the background and the pieces not being dragged"""
+        self.board_surface.fill((255, 255, 255))
+        self.board_surface.blit(self.background, (0, 0))
+
+        for (y, x), piece in self.board:
+            if piece is None or (y, x) == dragging_from:
                 continue
 
-            piece_image = self.piece_images[piece.get_image_path()]
+            piece_image = self.piece_sprites[piece.code]
             piece_position = (
                 x * SQUARE_SIZE + PIECE_OFFSET,
                 y * SQUARE_SIZE + PIECE_OFFSET,
             )
-            surface.blit(piece_image, piece_position)
-
-        if self.dragging:
-            piece = self.board[self.dragging_from]
-            if piece is not None:
-                image = self.piece_images[piece.get_image_path()]
-                mouse_position = pygame.mouse.get_pos()
-                real_blit_position = (
-                    mouse_position[0] - PIECE_SPRITE_SIZE // 2,
-                    mouse_position[1] - PIECE_SPRITE_SIZE // 2,
+            self.board_surface.blit(piece_image, piece_position)
+
+        if dragging_from is not None:
+            for y, x in self.board.legal_targets(dragging_from):
+                self.board_surface.blit(
+                    self.target_hint, (x * SQUARE_SIZE, y * SQUARE_SIZE)
                 )
-                surface.blit(image, real_blit_position)
+
+        if self.promotion_overlay is not None:
+            self.promotion_overlay.draw(self.board_surface)
 
     def handle_event(self, event) -> ScreenTransition | None:
+        # A pending promotion only takes the clicks on its menu
+        if self.promotion_overlay is not None:
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                self.handle_promotion_click(event)
+            return
+
         handler = self.handlers.get(event.type)
 
         if handler is not None:
             self.transition = handler(event)
 
     def handle_mouse_down(self, event):
+        # The pieces can not be moved while the engine thinks
+        if self.board.player == self.engine_color:
+            return
+
         self.dragging = True
         self.dragging_from = self.get_hovered_square()
 
@@ -77,16 +183,33 @@ class Board(Screen):
             return
 
         target_position = self.get_hovered_square()
-        move = self.board.process_move(self.dragging_from, target_position)
 
-        if isinstance(move, Promotion) and move.is_valid():
-            promotes_to = PromotionOverlay(move.piece.color, *target_position).get()
-            move.promotes_to = promotes_to
+        # Drops on squares the piece can not reach are ignored
+        if target_position in self.board.legal_targets(self.dragging_from):
+            move = self.board.process_move(self.dragging_from, target_position)
+
+            if isinstance(move, Promotion):
+                # The movement is made once the piece is chosen
+                self.promotion_move = move
+                self.promotion_overlay = PromotionOverlay(
+                    move.piece.color, target_position
+                )
+            else:
+                self.board.make_move(move)
 
-        self.board.make_move(move)
         self.dragging = False
         self.dragging_from = (None, None)
 
+    def handle_promotion_click(self, event):
+        """Promote to the clicked piece, or cancel if outside the menu"""
+        promotes_to = self.promotion_overlay.choice_at(event.pos)
+        if promotes_to is not None:
+            self.promotion_move.promotes_to = promotes_to
+            self.board.make_move(self.promotion_move)
+
+        self.promotion_move = None
+        self.promotion_overlay = None
+
     def get_hovered_square(self):
         position = pygame.mouse.get_pos()
         return (position[1] // SQUARE_SIZE, position[0] // SQUARE_SIZE)
@@ -94,6 +217,9 @@ class Board(Screen):
     def handle_keyboard(self, event):
         if event.key == ord("u"):
             self.board.undo_move()
+            # Undo the movement of the engine too, back to the player turn
+            if self.board.player == self.engine_color:
+                self.board.undo_move()
         elif event.key == ord("n"):
             self.board.new_game()
         elif pygame.K_ESCAPE:
@@ -101,7 +227,11 @@ class Board(Screen):
 
     def get_transition(self):
         if self.board.game_over:
-            return ScreenTransition("game", "game_over", {"winner": self.board.winner})
+            return ScreenTransition(
+                "game",
+                "game_over",
+                {"winner": self.board.winner, "termination": self.board.termination},
+            )
         elif self.exit:
             return ScreenTransition("game", "menu")
         else:
@@ -109,60 +239,48 @@ class Board(Screen):
 
 
 class PromotionOverlay:
+    """Menu to choose the piece a pawn promotes to
+
+    The Board screen draws the menu over the board, and passes it the
+    clicks while the choice is pending.
+
+    Arguments:
+        piece_color (Color): Color of the promoting pawn
+        position (tuple[int, int]): Square where the pawn promotes
+    """
+
+    menu_items = (pieces.Queen, pieces.Knight, pieces.Rook, pieces.Bishop)
+
     def __init__(self, piece_color, position):
         y, x = position
-        self.x = x
-        self.y = y
-        self.piece_color = piece_color
-
-        if piece_color == pieces.Color.WHITE:
-            self.menu_cooords = (x * SQUARE_SIZE, y * SQUARE_SIZE)
-        else:
-            self.menu_cooords = (x * SQUARE_SIZE, (y - 3) * SQUARE_SIZE)
+        # The menu goes from the promotion square towards the board
+        top = y if piece_color == pieces.Color.WHITE else y - 3
+        self.menu_rect = pygame.Rect(
+            x * SQUARE_SIZE, top * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE * 4
+        )
 
-        self.overlay = pygame.Surface((512, 512))
+        self.overlay = pygame.Surface(pygame.display.get_surface().get_size())
         self.overlay.set_alpha(64)
         self.overlay.fill((0, 0, 0))
 
-        self.menu = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE * 4), pygame.SRCALPHA)
+        self.menu = pygame.Surface(self.menu_rect.size, pygame.SRCALPHA)
         self.menu.fill((200, 200, 200, 255))
-        self.menu_items = dict(
-            enumerate(
-                (
-                    ("queen", pieces.Queen),
-                    ("knight", pieces.Knight),
-                    ("rook", pieces.Rook),
-                    ("bishop", pieces.Bishop),
-                )
-            )
-        )
-
-        for index, (piece_name, _) in self.menu_items.items():
+        for index, piece_class in enumerate(self.menu_items):
             self.menu.blit(
-                pygame.image.load(
-                    f"assets/images/{piece_color.name.lower()}/{piece_name}.png"
-                ),
+                piece_sprite(piece_class(piece_color)),
                 (PIECE_OFFSET, PIECE_OFFSET + SQUARE_SIZE * index),
             )
 
-    def get(self):
-        screen = pygame.display.get_surface()
-        screen.blit(self.overlay, (0, 0))
-        screen.blit(self.menu, self.menu_cooords)
-
-        while True:
-            for event in pygame.event.get():
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    x, y = event.pos
-                    item_x, item_y = x // SQUARE_SIZE, y // SQUARE_SIZE
-
-                    if item_x == self.x:
-                        item_y = (
-                            item_y
-                            if self.piece_color == pieces.Color.WHITE
-                            else (item_y + 4) % 4
-                        )
-                        if item_y < 4:
-                            return self.menu_items[item_y][1]
-
-            pygame.display.update()
+    def draw(self, surface):
+        surface.blit(self.overlay, (0, 0))
+        surface.blit(self.menu, self.menu_rect)
+
+    def choice_at(self, position):
+        """Return the piece class of the menu item at a screen position
+
+        Return:
+            The piece class, or None if the position is outside the menu
+        """
+        if not self.menu_rect.collidepoint(position):
+            return None
+        return self.menu_items[(position[1] - self.menu_rect.top) // SQUARE_SIZE]
@@ -19,10 +19,13 @@ class GameOver(Screen):
         self.manager = pygame_gui.UIManager(display_size, "assets/theme.json")
 
         winner = transition.data["winner"]
-        winner_str = winner.name.capitalize()
+        if winner is not None:
+            result_str = f"{winner.name.capitalize()} won!"
+        else:
+            result_str = f"Draw by {transition.data['termination'].value}!"
 
         self.title = pygame_gui.elements.UITextBox(
-            f"<font size=7>Game Over!</font><br><font size=5>{winner_str} won!</font>",
+            f"<font size=7>Game Over!</font><br><font size=5>{result_str}</font>",
             relative_rect=pygame.Rect((50, 50), (412, 100)),
             manager=self.manager,
             wrap_to_height=True,
@@ -5,15 +5,30 @@ from .game_over import GameOver
 from .menu import Menu
 from .board import Board
 
+# Maximum frames drawn per second
+FRAME_RATE = 60
+
 
 class MainUI:
-    def __init__(self, game):
+    """Window of the game, switching between the screens
+
+    Arguments:
+        game (ChessGame): Game played on the board screen
+        engine (Optional[EnginePlayer]): Engine playing one of the sides.
+            It is closed when the window is
+        engine_color (Optional[Color]): Side played by the engine
+    """
+
+    def __init__(self, game, engine=None, engine_color=None):
         pygame.init()
         pygame.display.set_caption("Chess Game")
         self.window = pygame.display.set_mode((512, 512))
 
         self.game = game
+        self.engine = engine
+        self.engine_color = engine_color
         self.active_screen = Menu()
+        self.clock = pygame.time.Clock()
 
         self.running = True
 
@@ -33,12 +48,23 @@ class MainUI:
                     self.running = False
                 self.active_screen.handle_event(event)
 
-            self.active_screen.draw(self.window)
-            pygame.display.update()
+            dirty = self.active_screen.draw(self.window)
+            if dirty is None:
+                pygame.display.update()
+            elif dirty:
+                pygame.display.update(dirty)
 
             transition = self.active_screen.get_transition()
             if transition is not None and transition.to_state in self.transitions:
+                # The engine only searches while the board is shown
+                if self.engine is not None:
+                    self.engine.stop()
                 self.transitions[transition.to_state](transition)
+
+            self.clock.tick(FRAME_RATE)
+
+        if self.engine is not None:
+            self.engine.close()
         pygame.quit()
 
     def to_new_game(self, transition=None):
@@ -46,7 +72,7 @@ class MainUI:
         self.to_game()
 
     def to_game(self, transition=None):
-        self.active_screen = Board(self.game)
+        self.active_screen = Board(self.game, self.engine, self.engine_color)
 
     def to_about(self, transition=None):
         self.active_screen = About()
@@ -0,0 +1,64 @@
+"""Host many games headless, over a TCP line protocol
+
+See 'game/server.py' for the commands of the protocol.
+
+Usage:
+    python3 serve.py [--host HOST] [--port PORT] [--workers N] [--engine-depth N]
+                     [--engine-time SECONDS] [--report-interval SECONDS]
+"""
+
+import argparse
+import asyncio
+import sys
+
+from game.server import GameServer
+
+
+async def report(server, interval):
+    """Print the stats of the server periodically"""
+    while True:
+        await asyncio.sleep(interval)
+        stats = " ".join(f"{name}={value}" for name, value in server.stats().items())
+        print(stats, file=sys.stderr)
+
+
+async def run(args):
+    server = GameServer(args.workers, args.engine_depth, args.engine_time)
+    tasks = [server.serve(args.host, args.port)]
+    if args.report_interval:
+        tasks.append(report(server, args.report_interval))
+
+    print(f"Serving on {args.host}:{args.port}", file=sys.stderr)
+    await asyncio.gather(*tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Engine processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--engine-depth", type=int, default=6, help="Maximum engine search depth"
+    )
+    parser.add_argument(
+        "--engine-time", type=float, default=1.0, help="Engine time per movement"
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=0,
+        help="Seconds between stats reports on stderr (default: no reports)",
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
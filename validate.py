@@ -0,0 +1,57 @@
+"""Validate PGN game archives across several processes
+
+Replays every game of the given PGN files, reporting the games with
+illegal movements and the throughput of the run.
+
+Usage:
+    python3 validate.py [--workers N] [--chunk-size N] [--mmap] [--verbose] FILE ...
+"""
+
+import argparse
+import sys
+from itertools import chain
+
+from game.batch import BatchStats, validate_games
+from game.pgn import open_games
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+", help="PGN files to validate")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=64, help="Games sent to a worker at a time"
+    )
+    parser.add_argument(
+        "--mmap", action="store_true", help="Read the files through memory maps"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Print the verdict of every game"
+    )
+    args = parser.parse_args()
+
+    games = chain.from_iterable(open_games(path, args.mmap) for path in args.files)
+    stats = BatchStats()
+
+    for verdict in validate_games(games, args.workers, args.chunk_size, stats=stats):
+        if not verdict.legal:
+            print(f"game {verdict.index + 1}: {verdict.error}")
+        elif args.verbose:
+            print(
+                f"game {verdict.index + 1}: legal, {verdict.plies} plies, "
+                f"result {verdict.result}"
+            )
+
+    print(
+        f"{stats.games} games, {stats.illegal} illegal, {stats.plies} plies in "
+        f"{stats.elapsed:.2f}s: {stats.games_per_second:.1f} games/s, "
+        f"{stats.plies_per_second:.0f} plies/s",
+        file=sys.stderr,
+    )
+    return 1 if stats.illegal else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())